@@ -5,7 +5,7 @@ import os
 import torch
 import gradio as gr
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, TextIteratorStreamer
-from utils import check_adapter_path, load_model, load_peft_model, load_tokenizer, get_device
+from utils import BatchTokenizer, check_adapter_path, fit_to_context, load_model, load_peft_model, load_tokenizer, get_device
 from fastapi import FastAPI, HTTPException
 from sse_starlette.sse import EventSourceResponse
 import json
@@ -20,6 +20,14 @@ parser = argparse.ArgumentParser(description='Check model usage.')
 # Add the arguments
 parser.add_argument('--baseonly', action='store_true', 
                     help='A boolean switch to indicate base only mode')
+parser.add_argument('--model', type=str, default=None,
+                    help='Override the model path, e.g. a tiny model for benchmarking on CPU')
+parser.add_argument('--port', type=int, default=7860,
+                    help='Port to host the web app and API on')
+parser.add_argument('--truncation', choices=['middle', 'left', 'error'], default='middle',
+                    help='How to handle prompts longer than the context: drop the middle, drop the oldest tokens or reject')
+parser.add_argument('--reserve_tokens', type=int, default=256,
+                    help='Tokens kept free for generation when a request does not set max_tokens')
 
 # Execute the parse_args() method
 args = parser.parse_args()
@@ -29,6 +37,8 @@ model_name = "../model-cache/microsoft/Phi-3-mini-4k-instruct"
 adapters_name = "../models/qlora/qlora/gpu_model/adapter"  # Ensure this path is correctly set before running
 torch_dtype = torch.<compute_dtype>  # Set the appropriate torch data type
 quant_type = '<quant_type>'  # Set the appropriate quantization type
+if args.model:
+    model_name = args.model
 
 
 # Display device and CPU thread information
@@ -49,6 +59,19 @@ if os.path.exists(adapters_name) and not args.baseonly:
 
 device = get_device()
 
+# Encode and decode on a shared worker pool so concurrent requests are batched
+batch_tokenizer = BatchTokenizer(tokenizer)
+
+# Tokenizers without a configured limit report a huge placeholder as model_max_length
+context_length = min(tokenizer.model_max_length,
+                     getattr(model.config, "max_position_embeddings", tokenizer.model_max_length))
+
+# Token counts of the template around the user input, these are always kept when truncating
+template = "<prompt_template>"
+template_prefix, template_suffix = template.split("{}", 1) if usingAdapter and "{}" in template else ("", "")
+template_head_tokens = len(tokenizer(template_prefix)["input_ids"])
+template_tail_tokens = len(tokenizer(template_suffix, add_special_tokens=False)["input_ids"])
+
 print(f"Model {model_name} loaded successfully on {device}")
 
 class ChatCompletionsRequestMessage(BaseModel):
@@ -62,36 +85,34 @@ class ChatCompletionsRequest(BaseModel):
     temperature: float = Field(1)
     top_p: float = Field(1)
 
-def calculate_token_count(tokenizer: AutoTokenizer, input: str):
-    result = tokenizer(input)
-    if 'input_ids' not in result:
-        return 0
-    return len(result['input_ids'])
-
-# Host the model as an OpenAI chat completion compatible RESTful API
-def inference_generator(request: ChatCompletionsRequest):
-    template = "<prompt_template>"
-    user_messages = list(filter(lambda m: m.role == "user", request.messages))
-    if len(user_messages) == 0:
-        raise HTTPException(status_code=400, detail="'messages' should contain at least 1 user message")
-    input_message = user_messages[-1]
-
-    prompt = template.format(input_message.content) if usingAdapter else input_message.content
-    context_length = tokenizer.model_max_length
-    input_token_count = calculate_token_count(tokenizer, prompt)
-    
-    print(f"Prompt: '{prompt}'")
-
-    if request.max_tokens > 0:
-        max_new_tokens = min(context_length - input_token_count, request.max_tokens)
+def build_model_inputs(input_ids: List[int]):
+    input_tensor = torch.tensor([input_ids], device=device)
+    return {"input_ids": input_tensor, "attention_mask": torch.ones_like(input_tensor)}
+
+def prepare_inputs(prompt: str, max_tokens: int):
+    """
+    Encodes the prompt once and fits it into the context window, so oversized prompts are
+    truncated or rejected before any prefill happens.
+    Raises ValueError if the prompt cannot fit.
+    """
+    input_ids = batch_tokenizer.encode(prompt)
+    input_token_count = len(input_ids)
+    reserve_tokens = min(max_tokens if max_tokens > 0 else args.reserve_tokens, context_length // 2)
+    input_ids = fit_to_context(input_ids, context_length - reserve_tokens, template_head_tokens,
+                               template_tail_tokens, args.truncation)
+    if len(input_ids) < input_token_count:
+        print(f"Prompt truncated from {input_token_count} to {len(input_ids)} tokens")
+
+    if max_tokens > 0:
+        max_new_tokens = min(context_length - len(input_ids), max_tokens)
     else:
-        max_new_tokens = context_length - input_token_count
-
-    model_inputs = tokenizer(prompt, return_tensors="pt")
-    model_inputs = model_inputs.to(device)
+        max_new_tokens = context_length - len(input_ids)
+    return build_model_inputs(input_ids), max_new_tokens
 
+# Host the model as an OpenAI chat completion compatible RESTful API
+def inference_generator(request: ChatCompletionsRequest, model_inputs, max_new_tokens: int):
     # Generate text in a separate thread
-    streamer = TextIteratorStreamer(tokenizer, timeout=10., skip_prompt=True, skip_special_tokens=True)
+    streamer = TextIteratorStreamer(batch_tokenizer, timeout=10., skip_prompt=True, skip_special_tokens=True)
     generate_kwargs = dict(
         model_inputs,
         streamer=streamer,
@@ -131,18 +152,32 @@ def inference_generator(request: ChatCompletionsRequest):
 def configure_api(app: FastAPI):
     @app.post("/v1/chat/completions")
     def chat_completion(request: ChatCompletionsRequest):
+        user_messages = list(filter(lambda m: m.role == "user", request.messages))
+        if len(user_messages) == 0:
+            raise HTTPException(status_code=400, detail="'messages' should contain at least 1 user message")
+        input_message = user_messages[-1]
+
+        prompt = template.format(input_message.content) if usingAdapter else input_message.content
+        print(f"Prompt: '{prompt}'")
+        try:
+            model_inputs, max_new_tokens = prepare_inputs(prompt, request.max_tokens)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # "\n" is the standard way but sse_starlette defaults to \r\n
         # https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events#sending_events_from_the_server
-        return EventSourceResponse(inference_generator(request), sep="\n")
+        return EventSourceResponse(inference_generator(request, model_inputs, max_new_tokens), sep="\n")
 
 # Host the model as a Gradio web app
 def run_generation(user_text, top_p, temperature, top_k, max_new_tokens):
-    template = "<prompt_template>"
-    model_inputs = tokenizer(template.format(user_text) if usingAdapter else user_text, return_tensors="pt")
-    model_inputs = model_inputs.to(device)
+    try:
+        model_inputs, max_new_tokens = prepare_inputs(template.format(user_text) if usingAdapter else user_text,
+                                                      int(max_new_tokens))
+    except ValueError as e:
+        raise gr.Error(str(e))
 
     # Generate text in a separate thread
-    streamer = TextIteratorStreamer(tokenizer, timeout=10., skip_prompt=True, skip_special_tokens=True)
+    streamer = TextIteratorStreamer(batch_tokenizer, timeout=10., skip_prompt=True, skip_special_tokens=True)
     generate_kwargs = dict(
         model_inputs,
         streamer=streamer,
@@ -191,4 +226,4 @@ app = configure_gradio(app)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7860)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
\ No newline at end of file
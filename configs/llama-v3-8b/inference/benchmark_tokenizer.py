@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Measures tokenization throughput under concurrency, comparing per-request tokenizer calls
+# with the batched worker pool used by gradio_chat.py, e.g.
+#   python benchmark_tokenizer.py --concurrency 1 8 32 64
+
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import BatchTokenizer, load_tokenizer
+
+WORDS = ["model", "token", "latency", "stream", "python", "question", "answer", "window", "cache", "server"]
+
+
+def make_prompts(count, words_per_prompt, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_prompt)) for _ in range(count)]
+
+
+def measure(function, items, concurrency):
+    """
+    Runs function over items from `concurrency` threads.
+    Returns:
+    float: Items processed per second.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(function, items))
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tokenization throughput at high concurrency.')
+    parser.add_argument('--model', default="../model-cache/meta-llama/Llama-v3-8b",
+                        help='Model path to load the tokenizer from')
+    parser.add_argument('--prompts', type=int, default=2000, help='Number of prompts per measurement')
+    parser.add_argument('--words', type=int, default=200, help='Words per prompt')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Optional path to write the JSON results')
+    args = parser.parse_args()
+
+    tokenizer = load_tokenizer(args.model)
+    batch_tokenizer = BatchTokenizer(tokenizer)
+    prompts = make_prompts(args.prompts, args.words, args.seed)
+    encoded = [tokenizer(prompt)["input_ids"] for prompt in prompts]
+
+    results = []
+    for concurrency in args.concurrency:
+        result = {
+            "concurrency": concurrency,
+            "encode_direct": measure(lambda p: tokenizer(p)["input_ids"], prompts, concurrency),
+            "encode_batched": measure(batch_tokenizer.encode, prompts, concurrency),
+            "decode_direct": measure(lambda ids: tokenizer.decode(ids, skip_special_tokens=True), encoded,
+                                     concurrency),
+            "decode_batched": measure(lambda ids: batch_tokenizer.decode(ids, skip_special_tokens=True), encoded,
+                                      concurrency),
+        }
+        results.append(result)
+        print(f"concurrency {concurrency:>3}: encode {result['encode_direct']:>9.0f} -> {result['encode_batched']:>9.0f}"
+              f" prompts/s, decode {result['decode_direct']:>9.0f} -> {result['decode_batched']:>9.0f} sequences/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({"model": args.model, "prompts": args.prompts, "words": args.words, "results": results},
+                      file, indent=4)
+            file.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Load generator for the OpenAI compatible API hosted by gradio_chat.py.
+# Only uses the Python standard library so it can run from any environment, e.g.
+#   python gradio_chat.py --baseonly --model <tiny-model-path>
+#   python benchmark_chat.py --dataset dataset.jsonl --concurrency 4 --rate 2
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+SYNTHETIC_WORDS = ["model", "token", "latency", "stream", "python", "question", "answer", "window", "cache", "server"]
+
+
+def load_prompts(dataset_path, field=None):
+    """
+    Loads prompts from a JSON lines dataset (e.g. datasets/new-dataset/dataset.jsonl) or a JSON array.
+    Args:
+    dataset_path (str): Path to the dataset file.
+    field (str): The field to read the prompt from. Defaults to the first string field of each record.
+    Returns:
+    list: The prompts in file order.
+    """
+    with open(dataset_path, 'r', encoding='utf-8') as file:
+        content = file.read().strip()
+    if content.startswith('['):
+        records = json.loads(content)
+    else:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    prompts = []
+    for record in records:
+        if isinstance(record, str):
+            prompts.append(record)
+        elif field:
+            prompts.append(str(record[field]))
+        else:
+            prompts.append(next(str(v) for v in record.values() if isinstance(v, str)))
+    if not prompts:
+        raise ValueError(f"No prompts found in {dataset_path}")
+    return prompts
+
+
+def parse_length_mix(length_mix):
+    """
+    Parses a synthetic length mix like '16:0.5,64:0.3,256:0.2' into (word_count, weight) pairs.
+    """
+    mix = []
+    for item in length_mix.split(','):
+        length, weight = item.split(':')
+        mix.append((int(length), float(weight)))
+    return mix
+
+
+def build_workload(prompts, length_mix, num_requests, rate, seed):
+    """
+    Builds a deterministic list of (send_offset_seconds, prompt) for the run.
+    Prompts are sampled from the dataset or generated from the length mix, and arrivals follow
+    a Poisson process with the given rate. A rate of 0 sends every request as soon as a slot is free.
+    """
+    rng = random.Random(seed)
+    workload = []
+    offset = 0.0
+    for _ in range(num_requests):
+        if prompts:
+            prompt = rng.choice(prompts)
+        else:
+            lengths = [length for length, _ in length_mix]
+            weights = [weight for _, weight in length_mix]
+            length = rng.choices(lengths, weights=weights)[0]
+            prompt = " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(length))
+        workload.append((offset, prompt))
+        if rate > 0:
+            offset += rng.expovariate(rate)
+    return workload
+
+
+def send_request(url, prompt, max_tokens, temperature, top_p, timeout):
+    """
+    Sends one streaming chat completion request and records the timing of each received chunk.
+    Returns:
+    dict: Per request metrics. Times are in seconds relative to the request start.
+    """
+    parsed = urlparse(url)
+    connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    body = json.dumps({
+        "stream": True,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+    })
+    result = {"prompt_chars": len(prompt), "chunks": 0, "output_chars": 0, "error": None}
+    chunk_times = []
+    start = time.perf_counter()
+    connection = connection_class(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        connection.request("POST", parsed.path or "/v1/chat/completions", body=body,
+                           headers={"Content-Type": "application/json", "Accept": "text/event-stream"})
+        response = connection.getresponse()
+        if response.status != 200:
+            result["error"] = f"HTTP {response.status}: {response.read().decode('utf-8', 'replace')[:200]}"
+            return result
+        while True:
+            line = response.readline()
+            if not line:
+                break
+            line = line.decode('utf-8').strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            content = event["choices"][0]["delta"].get("content") or ""
+            if content:
+                chunk_times.append(time.perf_counter() - start)
+                result["output_chars"] += len(content)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        connection.close()
+        result["e2e"] = time.perf_counter() - start
+        result["chunks"] = len(chunk_times)
+        result["ttft"] = chunk_times[0] if chunk_times else None
+        result["itl"] = [b - a for a, b in zip(chunk_times, chunk_times[1:])]
+    return result
+
+
+def percentiles(values):
+    """
+    Summarizes a list of latencies in seconds.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": pick(50),
+        "p90": pick(90),
+        "p99": pick(99),
+        "max": ordered[-1],
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args):
+    prompts = load_prompts(args.dataset, args.field) if args.dataset else None
+    workload = build_workload(prompts, parse_length_mix(args.length_mix), args.requests, args.rate, args.seed)
+
+    results = [None] * len(workload)
+    slots = threading.Semaphore(args.concurrency)
+
+    def worker(index, queue_delay):
+        try:
+            result = send_request(args.url, workload[index][1], args.max_tokens, args.temperature, args.top_p,
+                                  args.timeout)
+            # Time spent waiting for a free concurrency slot after the scheduled arrival
+            result["queue_delay"] = queue_delay
+            results[index] = result
+        finally:
+            slots.release()
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for index, (offset, _) in enumerate(workload):
+            delay = begin + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            executor.submit(worker, index, max(0.0, time.perf_counter() - begin - offset))
+    duration = time.perf_counter() - begin
+
+    succeeded = [r for r in results if not r["error"]]
+    total_chunks = sum(r["chunks"] for r in succeeded)
+    return {
+        "config": {
+            "url": args.url,
+            "dataset": args.dataset,
+            "length_mix": None if args.dataset else args.length_mix,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "seed": args.seed,
+            "max_tokens": args.max_tokens,
+            "temperature": args.temperature,
+            "top_p": args.top_p,
+        },
+        "commit": get_commit(),
+        "summary": {
+            "duration": duration,
+            "completed": len(succeeded),
+            "errors": len(results) - len(succeeded),
+            "error_rate": (len(results) - len(succeeded)) / len(results) if results else 0.0,
+            "requests_per_second": len(succeeded) / duration if duration else 0.0,
+            "chunks_per_second": total_chunks / duration if duration else 0.0,
+            "ttft": percentiles([r["ttft"] for r in succeeded if r["ttft"] is not None]),
+            "itl": percentiles([v for r in succeeded for v in r["itl"]]),
+            "e2e": percentiles([r["e2e"] for r in succeeded]),
+            "queue_delay": percentiles([r["queue_delay"] for r in results]),
+        },
+        "requests": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the /v1/chat/completions endpoint of gradio_chat.py.')
+    parser.add_argument('--url', default='http://127.0.0.1:7860/v1/chat/completions', help='Chat completions URL')
+    parser.add_argument('--dataset', help='JSON lines or JSON array file to replay prompts from')
+    parser.add_argument('--field', help='Record field holding the prompt, defaults to the first string field')
+    parser.add_argument('--length-mix', default='16:0.5,64:0.3,256:0.2',
+                        help='Synthetic prompt word counts and weights, used when no dataset is given')
+    parser.add_argument('--requests', type=int, default=32, help='Total number of requests to send')
+    parser.add_argument('--concurrency', type=int, default=4, help='Maximum number of requests in flight')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Poisson arrival rate in requests per second, 0 sends as fast as concurrency allows')
+    parser.add_argument('--max-tokens', type=int, default=64)
+    parser.add_argument('--temperature', type=float, default=1.0)
+    parser.add_argument('--top-p', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=120.0, help='Socket timeout per request in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for prompt sampling and arrival times')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+        file.write('\n')
+
+    summary = report["summary"]
+    print(f"Completed {summary['completed']} requests with {summary['errors']} errors in {summary['duration']:.2f}s")
+    for name in ["ttft", "itl", "e2e"]:
+        if summary[name]:
+            print(f"{name}: p50 {summary[name]['p50'] * 1000:.1f}ms p90 {summary[name]['p90'] * 1000:.1f}ms "
+                  f"p99 {summary[name]['p99'] * 1000:.1f}ms")
+    print(f"Throughput: {summary['requests_per_second']:.2f} req/s, {summary['chunks_per_second']:.2f} chunks/s")
+    print(f"Results written to {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
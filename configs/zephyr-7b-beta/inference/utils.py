@@ -2,7 +2,12 @@
 # Licensed under the MIT license.
 
 import os
+import queue
 import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Thread
+
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, TextStreamer
 from peft import PeftModel
@@ -34,16 +39,134 @@ def load_tokenizer(model_name):
     model_name (str): The name of the model for which to load the tokenizer.
     Returns:
     AutoTokenizer: The loaded tokenizer with special tokens added and padding side set.
+    Raises:
+    ValueError: If the model does not provide a fast (Rust) tokenizer.
     """
-    tok = AutoTokenizer.from_pretrained(model_name, device_map=get_device_map(), trust_remote_code=True)
+    tok = AutoTokenizer.from_pretrained(model_name, device_map=get_device_map(), trust_remote_code=True, use_fast=True)
+    if not tok.is_fast:
+        raise ValueError(f"A fast tokenizer is required but {model_name} only provides {type(tok).__name__}.")
     tok.add_special_tokens({'pad_token': '[PAD]'})
     tok.padding_side = 'right'  # TRL requires right padding
     return tok
 
+class BatchTokenizer:
+    """
+    Runs tokenization on a dedicated worker pool instead of the request threads.
+    Prompts submitted within `window` seconds of each other are encoded with a single batch call,
+    and concurrent decodes (e.g. from several streamers) are merged the same way. Batch calls of the
+    fast tokenizer run in Rust without holding the GIL, so they do not contend with generation threads.
+    It can be passed to TextIteratorStreamer in place of the tokenizer.
+    """
+
+    def __init__(self, tokenizer, window=0.002, max_batch_size=64, num_workers=2):
+        """
+        Args:
+        tokenizer (PreTrainedTokenizerFast): The fast tokenizer to use.
+        window (float): Seconds to wait for more prompts before encoding a batch.
+        max_batch_size (int): Maximum number of items per batch call.
+        num_workers (int): Number of threads running batch calls.
+        """
+        self.tokenizer = tokenizer
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.pending = queue.Queue()
+        self.last_batch_size = 1
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="tokenizer")
+        Thread(target=self._collect, daemon=True).start()
+
+    def encode(self, text):
+        """
+        Encodes one text with the tokenizer defaults (special tokens added, no truncation).
+        Returns:
+        list: The token ids.
+        """
+        return self._submit(("encode",), text)
+
+    def decode(self, token_ids, skip_special_tokens=False, **kwargs):
+        """
+        Decodes one sequence of token ids, same as tokenizer.decode.
+        """
+        if isinstance(token_ids, torch.Tensor):
+            token_ids = token_ids.tolist()
+        clean_up = kwargs.get("clean_up_tokenization_spaces", self.tokenizer.clean_up_tokenization_spaces)
+        return self._submit(("decode", bool(skip_special_tokens), bool(clean_up)), list(token_ids))
+
+    def __getattr__(self, name):
+        # Everything else, e.g. eos_token_id, is served by the wrapped tokenizer
+        return getattr(self.tokenizer, name)
+
+    def _submit(self, kind, item):
+        future = Future()
+        self.pending.put((kind, item, future))
+        return future.result()
+
+    def _collect(self):
+        while True:
+            batch = [self.pending.get()]
+            # Only wait for more prompts under concurrent load, decodes are on the streaming path and never wait
+            wait = batch[0][0][0] == "encode" and (self.last_batch_size > 1 or not self.pending.empty())
+            deadline = time.monotonic() + (self.window if wait else 0)
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.pending.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self.last_batch_size = len(batch)
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[0], []).append(request)
+            for kind, requests in groups.items():
+                self.executor.submit(self._run, kind, requests)
+
+    def _run(self, kind, requests):
+        try:
+            items = [item for _, item, _ in requests]
+            if kind[0] == "encode":
+                results = self.tokenizer(items)["input_ids"]
+            else:
+                _, skip_special_tokens, clean_up = kind
+                results = self.tokenizer.backend_tokenizer.decode_batch(items, skip_special_tokens=skip_special_tokens)
+                if clean_up:
+                    results = [self.tokenizer.clean_up_tokenization(text) for text in results]
+            for (_, _, future), result in zip(requests, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+
+def fit_to_context(input_ids, max_input_tokens, head_tokens=0, tail_tokens=0, strategy="middle"):
+    """
+    Fits an already encoded prompt into max_input_tokens at the token level.
+    The first head_tokens and last tail_tokens (the prompt template around the user input) are always kept.
+    Args:
+    input_ids (list): The encoded prompt.
+    max_input_tokens (int): The number of prompt tokens that fit into the context next to the generation budget.
+    head_tokens (int): Number of leading tokens belonging to the template, including special tokens.
+    tail_tokens (int): Number of trailing tokens belonging to the template.
+    strategy (str): 'middle' keeps the start and the most recent part of the input and drops the middle,
+        'left' keeps only the most recent part, 'error' rejects the prompt.
+    Returns:
+    list: The token ids to prefill.
+    Raises:
+    ValueError: If the prompt does not fit and cannot be truncated.
+    """
+    if len(input_ids) <= max_input_tokens:
+        return input_ids
+    budget = max_input_tokens - head_tokens - tail_tokens
+    if strategy == "error" or budget <= 0:
+        raise ValueError(f"Prompt has {len(input_ids)} tokens but only {max_input_tokens} fit into the context.")
+
+    body = input_ids[head_tokens:len(input_ids) - tail_tokens]
+    keep_start = budget // 4 if strategy == "middle" else 0
+    kept = body[:keep_start] + body[len(body) - (budget - keep_start):]
+    return input_ids[:head_tokens] + kept + input_ids[len(input_ids) - tail_tokens:]
+
 def load_model(model_name, torch_dtype, quant_type):
     """
     Loads and returns a model with the specified quantization configuration.
     If more than one GPU is available, wraps the model with DataParallel.
+    Quantization is skipped when CUDA is not available.
     Args:
     model_name (str): The name of the model to load.
     torch_dtype (torch.dtype): The data type for model weights (e.g., torch.float16).
@@ -51,18 +174,22 @@ def load_model(model_name, torch_dtype, quant_type):
     Returns:
     AutoModelForCausalLM: The loaded model possibly wrapped with DataParallel.
     """
+    # bitsandbytes 4-bit quantization requires CUDA, load the plain weights on CPU only machines
+    quantization_config = None
+    if torch.cuda.is_available():
+        quantization_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch_dtype,
+            bnb_4bit_use_double_quant=True,
+            bnb_4bit_quant_type=quant_type
+        )
     try:
         model = AutoModelForCausalLM.from_pretrained(
             pretrained_model_name_or_path=model_name,
             trust_remote_code=True,
             device_map=get_device_map(),
             torch_dtype=torch_dtype,
-            quantization_config=BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch_dtype,
-                bnb_4bit_use_double_quant=True,
-                bnb_4bit_quant_type=quant_type
-            ),
+            quantization_config=quantization_config,
         )
       
         return model
@@ -6,14 +6,33 @@ Provides comprehensive formatting capabilities including:
 - Sorting and organizing imports using isort
 - Formatting code using black with 120 character line length
 - Checking that all imports are at the top of files
+Tools run in process, files are formatted in parallel and files unchanged since they were formatted are skipped.
 """
 
+import hashlib
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
 import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from sanitize.utils import printError, printInfo, printTip, printWarning
 
+CACHE_FILE_NAME = ".auto_formatter_cache.json"
+ISORT_OPTIONS = {
+    "line_length": 120,
+    "multi_line_output": 3,
+    "include_trailing_comma": True,
+    "force_grid_wrap": 0,
+    "combine_as_imports": True,
+    "use_parentheses": True,
+}
+BLACK_LINE_LENGTH = 120
+
 
 def install_formatter_tools():
     """
@@ -25,19 +44,79 @@ def install_formatter_tools():
         ("autoflake", "autoflake"),  # Added autoflake for removing unused imports
     ]
 
-    for tool_name, package_name in tools:
-        try:
-            subprocess.run([tool_name, "--version"], check=True, capture_output=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+    for module_name, package_name in tools:
+        if importlib.util.find_spec(module_name) is None:
             printInfo(f"Installing {package_name} formatter...")
             try:
                 subprocess.run([sys.executable, "-m", "pip", "install", package_name], check=True)
             except subprocess.CalledProcessError as e:
                 printError(f"Failed to install {package_name}: {e}")
                 return False
+    importlib.invalidate_caches()
     return True
 
 
+def get_formatter_key():
+    """
+    Formatted files are only valid for the same tool versions and options.
+    """
+    # metadata only, importing black takes longer than checking unchanged files
+    versions = [importlib.metadata.version(name) for name in ["autoflake", "isort", "black"]]
+    key = [versions, ISORT_OPTIONS, BLACK_LINE_LENGTH]
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def hash_content(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def format_file(file_path):
+    """
+    Remove unused imports with autoflake, sort imports with isort and format with black, in this process.
+    Line endings of the file are kept.
+    Returns:
+    tuple: (file_path, hash of the formatted content, error message or None)
+    """
+    autoflake = importlib.import_module("autoflake")
+    black = importlib.import_module("black")
+    isort = importlib.import_module("isort")
+    with open(file_path, "rb") as f:
+        original = f.read()
+    try:
+        source = original.decode("utf-8")
+        newline = "\r\n" if "\r\n" in source else "\n"
+        source = source.replace("\r\n", "\n")
+        source = autoflake.fix_code(
+            source,
+            remove_all_unused_imports=True,
+            remove_unused_variables=True,
+            remove_duplicate_keys=True,
+            # Don't remove imports in __init__.py files
+            ignore_init_module_imports=os.path.basename(file_path) == "__init__.py",
+        )
+        source = isort.code(source, config=isort.Config(**ISORT_OPTIONS))
+        source = black.format_str(source, mode=black.Mode(line_length=BLACK_LINE_LENGTH))
+        formatted = source.replace("\n", newline).encode("utf-8")
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+    if formatted != original:
+        with open(file_path, "wb") as f:
+            f.write(formatted)
+    return file_path, hash_content(formatted), None
+
+
+def read_cache(cache_file, formatter_key):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("key") == formatter_key:
+            return cache.get("files", {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
 def check_imports_at_top(file_path):
     """
     Check if all imports are at the top of the file (after docstring and comments).
@@ -99,7 +178,7 @@ def check_imports_at_top(file_path):
         return True  # Don't fail the entire process
 
 
-def auto_format_scripts(target_dir=None):
+def auto_format_scripts(target_dir=None, workers=None):
     """
     Auto-format all Python scripts in the target directory with comprehensive formatting:
     - Remove unused imports using autoflake
@@ -109,6 +188,7 @@ def auto_format_scripts(target_dir=None):
 
     Args:
         target_dir: Path to the directory to format. If None, uses the scripts directory.
+        workers: Number of processes to format files with. If None, uses the number of CPUs.
     """
     if target_dir is None:
         target_dir = Path(__file__).parent
@@ -132,72 +212,42 @@ def auto_format_scripts(target_dir=None):
         printError("Failed to install required formatting tools.")
         return
 
-    # Step 1: Remove unused imports with autoflake
-    printInfo("Step 1: Removing unused imports...")
-    try:
-        autoflake_cmd = [
-            "autoflake",
-            "--in-place",  # Modify files in place
-            "--remove-all-unused-imports",  # Remove all unused imports
-            "--remove-unused-variables",  # Remove unused variables
-            "--remove-duplicate-keys",  # Remove duplicate keys in dictionaries
-            "--ignore-init-module-imports",  # Don't remove imports in __init__.py files
-        ] + python_files
-
-        result = subprocess.run(autoflake_cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            printInfo(f"Successfully removed unused imports from {len(python_files)} files.")
-            if result.stdout:
-                printInfo(result.stdout)
-        else:
-            printError(f"Autoflake failed: {result.stderr}")
-    except Exception as e:
-        printError(f"Error during unused import removal: {e}")
+    # Files whose content is what we formatted last time are skipped
+    cache_file = target_dir / CACHE_FILE_NAME
+    formatter_key = get_formatter_key()
+    cache = read_cache(cache_file, formatter_key)
+    cache_names = {py_file: os.path.relpath(py_file, target_dir).replace("\\", "/") for py_file in python_files}
+    files_to_format = []
+    for py_file in python_files:
+        with open(py_file, "rb") as f:
+            if cache.get(cache_names[py_file]) != hash_content(f.read()):
+                files_to_format.append(py_file)
+    printInfo(f"Formatting {len(files_to_format)} of {len(python_files)} files, others are unchanged.")
 
-    # Step 2: Sort imports with isort
-    printInfo("Step 2: Sorting and organizing imports...")
-    try:
-        isort_cmd = [
-            "isort",
-            "--line-length",
-            "120",
-            "--multi-line",
-            "3",
-            "--trailing-comma",
-            "--force-grid-wrap",
-            "0",
-            "--combine-as",
-            "--use-parentheses",
-        ] + python_files
-
-        result = subprocess.run(isort_cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            printInfo(f"Successfully sorted imports in {len(python_files)} files.")
+    # Step 1-3: Remove unused imports with autoflake, sort imports with isort and format with black
+    if len(files_to_format) > 1 and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(format_file, files_to_format))
+    else:
+        results = [format_file(py_file) for py_file in files_to_format]
+    new_cache = {name: cache[name] for name in cache_names.values() if name in cache}
+    for py_file, content_hash, error in results:
+        if error:
+            printError(f"Formatting {py_file} failed: {error}")
+            new_cache.pop(cache_names[py_file], None)
         else:
-            printError(f"Import sorting failed: {result.stderr}")
-    except Exception as e:
-        printError(f"Error during import sorting: {e}")
+            new_cache[cache_names[py_file]] = content_hash
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"key": formatter_key, "files": new_cache}, f, indent=4)
+    except OSError as e:
+        printWarning(f"Failed to write {cache_file}: {e}")
 
-    # Step 3: Check import placement
-    printInfo("Step 3: Checking import placement...")
+    # Step 4: Check import placement
+    printInfo("Step 4: Checking import placement...")
     for py_file in python_files:
         check_imports_at_top(py_file)
 
-    # Step 4: Format with black
-    printInfo("Step 4: Formatting code with black...")
-    try:
-        black_cmd = ["black", "--line-length", "120"] + python_files
-        result = subprocess.run(black_cmd, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            printInfo(f"Successfully formatted {len(python_files)} Python files with 120 character line length.")
-            if result.stdout:
-                printInfo(result.stdout)
-        else:
-            printError(f"Black formatting failed: {result.stderr}")
-    except Exception as e:
-        printError(f"Error during black formatting: {e}")
-
     printInfo("Auto-formatting completed!")
 
     # Clear sanitize modules from cache
@@ -1,32 +1,128 @@
 import json
+import hashlib
+import importlib
+import os
 import shutil
 import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
 from pathlib import Path
+from typing import Dict
 import argparse
 
+fcntl = importlib.import_module("fcntl") if sys.platform != "win32" else None
+
 ignore_patterns = ["info.yml", "_copy.json.config"]
 copied_folders = 0
+# from linux/fs.h
+FICLONE = 0x40049409
+reflink_supported = fcntl is not None
+
+
+def add_tree(files: Dict[str, str], source_dir: Path, target_dir: Path, ignore=()):
+    """
+    Add target file: source file of every file under source_dir, like shutil.copytree would copy them.
+    Plain strings, pathlib is slow for thousands of files.
+    """
+    for root, dirs, names in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if not any(fnmatch(d, pattern) for pattern in ignore)]
+        target_root = os.path.normpath(os.path.join(target_dir, os.path.relpath(root, source_dir)))
+        for name in names:
+            if not any(fnmatch(name, pattern) for pattern in ignore):
+                files[os.path.join(target_root, name)] = os.path.join(root, name)
+
 
-def copy_folder(model, models_dir: Path, olive_recipes_dir: Path, copy_license: bool = False):
+def copy_folder(model, models_dir: Path, olive_recipes_dir: Path, files: Dict[str, str], copy_license: bool = False):
     id = model.get("id")
     version = model.get("version")
     relative_path = model.get("relativePath").replace("\\", "/")
-    # make dir
     target_dir = models_dir / Path(id) / Path(str(version))
-    target_dir.mkdir(parents=True, exist_ok=True)
     source_dir = olive_recipes_dir / Path(relative_path)
-    # copy dir
-    print(f"Copying from {source_dir} to {target_dir}")
-    shutil.copytree(source_dir, target_dir, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*ignore_patterns))
+    add_tree(files, source_dir, target_dir, ignore_patterns)
     global copied_folders
     copied_folders += 1
     if copy_license:
         license_file = source_dir.parent / "LICENSE"
         # To avoid confusion of license of recipes, license of packages in runtime etc., rename the license file to LICENSE_OF_MODEL.txt
-        license_dst = target_dir / "LICENSE_OF_MODEL.txt"
-        if license_file.exists() and not license_dst.exists():
-            print(f"Copying from {license_file} to {license_dst}")
-            shutil.copyfile(license_file, license_dst)
+        license_dst = os.path.normpath(target_dir / "LICENSE_OF_MODEL.txt")
+        if license_file.exists() and license_dst not in files:
+            files[license_dst] = str(license_file)
+
+
+def file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def is_same_file(source: str, target: str) -> bool:
+    try:
+        target_stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source)
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:
+        return True
+    # mtime differs after a new checkout of olive-recipes although the content is the same
+    if file_hash(source) != file_hash(target):
+        return False
+    os.utime(target, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return True
+
+
+def copy_file(source: str, target: str):
+    """
+    Reflink when the filesystem supports it, so unchanged blocks are shared, otherwise copy.
+    Not hardlink, sanitize fixes files in place and would change olive-recipes too.
+    """
+    global reflink_supported
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if reflink_supported:
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, target)
+            return
+        except OSError:
+            # other filesystem or cross device, the target is written again below
+            reflink_supported = False
+    shutil.copy2(source, target)
+
+
+def sync_file(source: str, target: str) -> bool:
+    if is_same_file(source, target):
+        return False
+    copy_file(source, target)
+    return True
+
+
+def sync_files(files: Dict[str, str], folders, jobs=None):
+    """
+    Copy changed files and remove files not in files under folders, except .keep.
+    Returns:
+    tuple: Number of files copied, skipped and removed.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        copied = sum(executor.map(sync_file, files.values(), files.keys()))
+    removed = 0
+    for folder in folders:
+        keep = os.path.normpath(folder / ".keep")
+        for root, dirs, names in os.walk(folder, topdown=False):
+            for name in names:
+                path = os.path.join(root, name)
+                if path not in files and path != keep:
+                    os.remove(path)
+                    removed += 1
+            for name in dirs:
+                path = os.path.join(root, name)
+                if not os.listdir(path):
+                    os.rmdir(path)
+    return copied, len(files) - copied, removed
 
 
 def save_commit_id(models_dir: Path, olive_recipes_dir: Path):
@@ -39,15 +135,10 @@ def save_commit_id(models_dir: Path, olive_recipes_dir: Path):
         f.write(commit_id)
 
 
-def clean_folder(folder: Path):
-    shutil.move(folder / ".keep", folder.parent / ".keep")
-    shutil.rmtree(folder, ignore_errors=True)
-    folder.mkdir(parents=True, exist_ok=True)
-    shutil.move(folder.parent / ".keep", folder / ".keep")
-
 def main():
     parser = argparse.ArgumentParser(description="Copy model folders from olive-recipes to model_lab_configs.")
     parser.add_argument("--olive-recipes-dir", type=str, help="Path to the olive-recipes directory.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of threads to copy files with.")
     args = parser.parse_args()
 
     root_dir = Path(__file__).parent.parent.parent
@@ -64,19 +155,22 @@ def main():
     olive_list = olive_configs_dir / "model_list.json"
     models_dir = root_dir / "model_lab_configs"
 
-    clean_folder(models_dir / "huggingface")
-    clean_folder(models_dir / "extension")
-    clean_folder(models_dir / "requirements")
+    # target file: source file, files of later folders overwrite earlier ones like copytree did
+    files: Dict[str, str] = {}
     print(f"Copying requirements from {olive_recipes_dir / '.aitk' / 'requirements'} to {models_dir / 'requirements'}")
-    shutil.copytree(olive_recipes_dir / ".aitk" / "requirements", models_dir / "requirements", dirs_exist_ok=True)
+    add_tree(files, olive_recipes_dir / ".aitk" / "requirements", models_dir / "requirements")
 
     with open(olive_list, "r") as f:
         list = json.load(f)
 
     for model in list["models"]:
-        copy_folder(model, models_dir, olive_recipes_dir, copy_license=True)
+        copy_folder(model, models_dir, olive_recipes_dir, files, copy_license=True)
     for model in list["template_models"]:
-        copy_folder(model, models_dir, olive_recipes_dir)
+        copy_folder(model, models_dir, olive_recipes_dir, files)
+
+    folders = [models_dir / "huggingface", models_dir / "extension", models_dir / "requirements"]
+    copied, skipped, removed = sync_files(files, folders, args.jobs)
+    print(f"Copied {copied} files, skipped {skipped} unchanged files, removed {removed} stale files.")
 
     print(f"Copying model list from {olive_list} to {models_dir / 'model_list.json'}")
     shutil.copyfile(
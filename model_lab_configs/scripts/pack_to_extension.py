@@ -1,25 +1,207 @@
 import argparse
 import glob
+import hashlib
 import os
 import re
+import shutil
+import struct
+import tempfile
+import time
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 templateFile = "resources/template.zip"
 templateFileOrigin = "resources/template_origin.zip"
 
+# Fixed entry metadata, so packing the same files gives the same archive
+zipDateTime = (1980, 1, 1, 0, 0, 0)
+zipFileMode = 0o644 << 16
+compressLevel = 6
 
-def zipTemplate(input, output):
-    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Iterate over all the files in the folder
-        for root, dirs, files in os.walk(input):
-            # Exclude .git folder
-            if ".git" in dirs:
-                dirs.remove(".git")
-            for file in files:
-                # Create the full file path
-                full_path = os.path.join(root, file)
-                # Add file to zip
-                zipf.write(full_path, os.path.relpath(full_path, input))
+
+def listFiles(input):
+    result = []
+    for root, dirs, files in os.walk(input):
+        # Exclude .git folder
+        if ".git" in dirs:
+            dirs.remove(".git")
+        dirs.sort()
+        for file in sorted(files):
+            full_path = os.path.join(root, file)
+            result.append((os.path.relpath(full_path, input).replace("\\", "/"), full_path))
+    return result
+
+
+def compressFile(full_path):
+    """
+    Raw deflate data, CRC, sha256 and cpu seconds to compress a file. zlib releases the GIL, so this runs in threads
+    """
+    with open(full_path, "rb") as file:
+        data = file.read()
+    startTime = time.thread_time()
+    compressed = deflate(data)
+    seconds = time.thread_time() - startTime
+    return compressed, len(data), zlib.crc32(data), hashlib.sha256(data).hexdigest(), seconds
+
+
+def deflate(data):
+    compressor = zlib.compressobj(compressLevel, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def readRawEntry(fp, zinfo):
+    fp.seek(zinfo.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    nameLength, extraLength = struct.unpack("<HH", header[26:30])
+    fp.seek(zinfo.header_offset + zipfile.sizeFileHeader + nameLength + extraLength)
+    return fp.read(zinfo.compress_size)
+
+
+def writeRawEntry(zipf, name, compressed, size, crc, sha256):
+    # zipfile has no API to add already compressed data, so write the local header and data like ZipFile.write
+    zinfo = zipfile.ZipInfo(name, zipDateTime)
+    zinfo.external_attr = zipFileMode
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = size
+    zinfo.compress_size = len(compressed)
+    zinfo.CRC = crc
+    # the hash to reuse this entry next time
+    zinfo.comment = sha256.encode()
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(compressed)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[name] = zinfo
+
+
+def zipTemplate(input, output, previous=None, workers=None):
+    """
+    Pack input into output. Entries of files with the same path, size and sha256 as in previous,
+    an archive made by this function, are copied without compressing them again.
+    Returns:
+    dict: Counts and bytes of reused and compressed entries, seconds taken and estimated seconds saved.
+    """
+    startTime = time.perf_counter()
+    files = listFiles(input)
+    previousZip = None
+    previousEntries = {}
+    if previous and os.path.exists(previous):
+        try:
+            previousZip = zipfile.ZipFile(previous, "r")
+            previousEntries = {zinfo.filename: zinfo for zinfo in previousZip.infolist() if zinfo.comment}
+        except zipfile.BadZipFile:
+            previousZip = None
+
+    # Only hash files whose size matches, others are compressed anyway
+    jobs = []
+    # some reused content to measure compression speed when nothing else is compressed
+    sample = []
+    for name, full_path in files:
+        zinfo = previousEntries.get(name)
+        if zinfo and zinfo.file_size == os.path.getsize(full_path):
+            with open(full_path, "rb") as file:
+                data = file.read()
+            if hashlib.sha256(data).hexdigest() == zinfo.comment.decode():
+                jobs.append((name, zinfo, None))
+                if len(sample) < 64:
+                    sample.append(data)
+                continue
+        jobs.append((name, None, full_path))
+
+    stats = {"files": len(files), "reused": 0, "reusedBytes": 0, "compressed": 0, "compressedBytes": 0}
+    compressSeconds = 0.0
+    tmpOutput = output + ".tmp"
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(compressFile, full_path) if full_path else None for _, _, full_path in jobs]
+        with zipfile.ZipFile(tmpOutput, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for (name, zinfo, _), future in zip(jobs, futures):
+                if future is None:
+                    compressed = readRawEntry(previousZip.fp, zinfo)
+                    writeRawEntry(zipf, name, compressed, zinfo.file_size, zinfo.CRC, zinfo.comment.decode())
+                    stats["reused"] += 1
+                    stats["reusedBytes"] += zinfo.file_size
+                else:
+                    compressed, size, crc, sha256, seconds = future.result()
+                    compressSeconds += seconds
+                    writeRawEntry(zipf, name, compressed, size, crc, sha256)
+                    stats["compressed"] += 1
+                    stats["compressedBytes"] += size
+    if previousZip:
+        previousZip.close()
+    os.replace(tmpOutput, output)
+    stats["seconds"] = time.perf_counter() - startTime
+
+    compressedBytes = stats["compressedBytes"]
+    if not compressedBytes and sample:
+        data = b"".join(sample)
+        compressedBytes = len(data)
+        startTime = time.thread_time()
+        deflate(data)
+        compressSeconds = time.thread_time() - startTime
+    stats["savedSeconds"] = stats["reusedBytes"] * compressSeconds / compressedBytes if compressedBytes else 0.0
+    return stats
+
+
+def printStats(stats, output):
+    mb = 1024 * 1024
+    message = (
+        f"Packed {stats['files']} files into {output} in {stats['seconds']:.2f}s:"
+        f" {stats['compressed']} compressed ({stats['compressedBytes'] / mb:.1f} MB),"
+        f" {stats['reused']} reused ({stats['reusedBytes'] / mb:.1f} MB)"
+    )
+    if stats["reused"]:
+        message += f", about {stats['savedSeconds']:.2f}s of compression saved"
+    print(message)
+
+
+def benchmark(fileCount):
+    """
+    Pack a synthetic tree of configs and notebooks fully, then again after changing 1% of the files
+    """
+    with tempfile.TemporaryDirectory() as tempDir:
+        input = os.path.join(tempDir, "tree")
+        for i in range(fileCount):
+            folder = os.path.join(input, f"model-{i // 10}")
+            os.makedirs(folder, exist_ok=True)
+            if i % 10 == 0:
+                # notebook with a base64 image output
+                content = '{"cells": [], "outputs": "' + os.urandom(48 * 1024).hex() + '"}'
+            else:
+                content = (
+                    f'{{"name": "model-{i}", "passes": {{"quantization": {{"type": "OnnxStaticQuantization"}}}}}}\n'
+                    * 40
+                )
+            with open(os.path.join(folder, f"file-{i}.json"), "w") as file:
+                file.write(content)
+
+        # what zipTemplate did before: one ZipFile.write per file
+        startTime = time.perf_counter()
+        with zipfile.ZipFile(os.path.join(tempDir, "serial.zip"), "w", zipfile.ZIP_DEFLATED) as zipf:
+            for name, full_path in listFiles(input):
+                zipf.write(full_path, name)
+        print(f"Packed {fileCount} files with ZipFile.write in {time.perf_counter() - startTime:.2f}s")
+
+        output = os.path.join(tempDir, "template.zip")
+        full = zipTemplate(input, output)
+        printStats(full, "a new archive")
+        with open(output, "rb") as file:
+            fullHash = hashlib.sha256(file.read()).hexdigest()
+        for i in range(0, fileCount, 100):
+            with open(os.path.join(input, f"model-{i // 10}", f"file-{i}.json"), "a") as file:
+                file.write("\n")
+        incremental = zipTemplate(input, output, previous=output)
+        printStats(incremental, "the same archive")
+
+        # same content packed from scratch must give the same bytes
+        shutil.copy(output, os.path.join(tempDir, "incremental.zip"))
+        zipTemplate(input, output)
+        with open(output, "rb") as file, open(os.path.join(tempDir, "incremental.zip"), "rb") as incrementalFile:
+            deterministic = file.read() == incrementalFile.read()
+        with zipfile.ZipFile(output, "r") as zipf:
+            badFile = zipf.testzip()
+        print(f"Deterministic: {deterministic}, bad entries: {badFile}, full archive {fullHash[:12]}")
 
 
 def findFolder():
@@ -44,7 +226,13 @@ def findFolder():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--restore", action="store_true")
+    parser.add_argument("--full", action="store_true", help="Compress all files instead of reusing the last pack")
+    parser.add_argument("--workers", type=int, default=None, help="Threads to compress files with")
+    parser.add_argument("--benchmark", type=int, default=0, help="Pack a synthetic tree of this many files and exit")
     args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
+        exit(0)
     folder = findFolder()
     if not folder:
         print("No extension folder found.")
@@ -61,5 +249,6 @@ if __name__ == "__main__":
         if not os.path.exists(templateFileOrigin):
             os.rename(templateFile, templateFileOrigin)
         input = os.path.join(os.path.dirname(__file__), "../..")
-        zipTemplate(input, templateFile)
-        print(f"Packed resources into {templateFile}")
+        # Only our own packs have hashes to reuse, the original template is never reused
+        stats = zipTemplate(input, templateFile, None if args.full else templateFile, args.workers)
+        printStats(stats, templateFile)
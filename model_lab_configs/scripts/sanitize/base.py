@@ -2,11 +2,13 @@
 Base model classes
 """
 
-from typing import Optional
+from typing import Optional, Type, TypeVar
 
 from pydantic import BaseModel
 
-from .utils import open_ex
+from .utils import DocumentCache, printProcess
+
+T = TypeVar("T", bound="BaseModelClass")
 
 
 class BaseModelClass(BaseModel):
@@ -15,6 +17,18 @@ class BaseModelClass(BaseModel):
     _file: Optional[str] = None
     _fileContent: Optional[str] = None
 
+    @classmethod
+    def ReadFile(cls: Type[T], filePath: str) -> T:
+        """
+        Validate with the schema pydantic compiled for the class, and keep the content to compare when writing
+        """
+        printProcess(filePath)
+        content = DocumentCache.ReadText(filePath)
+        result = cls.model_validate_json(content, strict=True)
+        result._file = filePath
+        result._fileContent = content
+        return result
+
     def writeIfChanged(self):
         newContent = self.model_dump_json(indent=4, exclude_none=True)
         if self._file:
@@ -24,8 +38,7 @@ class BaseModelClass(BaseModel):
     def writeJsonIfChanged(cls, newContent: str, filePath: str, fileContent: str | None):
         newContent += "\n"
         if newContent != fileContent:
-            with open_ex(filePath, "w") as file:
-                file.write(newContent)
+            DocumentCache.Write(filePath, newContent)
 
     class Config:
         arbitrary_types_allowed = True
@@ -0,0 +1,170 @@
+"""
+Run sanitize over a synthetic tree and report wall time, peak memory and time per stage
+
+python -m sanitize.benchmark --models 1000 --workflows 3 --output report.json
+python -m sanitize.benchmark --models 1000 --workflows 3 --baseline report.json --tolerance 0.2
+python -m sanitize.benchmark --copy-config 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+from .copy_config import Replacement, replaceSequentially, replaceStrings
+from .synthetic_tree import generate
+
+
+def runSanitize(scriptsDir: str, treeDir: str, jobs: int, olivePath: str | None) -> dict[str, Any]:
+    """
+    Run in a new process every time so peak memory and caches are per run
+    """
+    with tempfile.TemporaryDirectory() as tempDir:
+        timingOutput = os.path.join(tempDir, "timing.json")
+        args = [sys.executable, "-m", "sanitize.main", "--config-dir", treeDir, "--full", "--jobs", str(jobs)]
+        args += ["--timing-output", timingOutput, "--format", "json", "--output", os.path.join(tempDir, "out.json")]
+        if olivePath:
+            args += ["--olive", olivePath]
+        startTime = time.perf_counter()
+        subprocess.run(args, cwd=scriptsDir, stdout=subprocess.DEVNULL, check=False)
+        wallTime = time.perf_counter() - startTime
+        with open(timingOutput, "r", encoding="utf-8") as file:
+            timing = json.load(file)
+    timing["wall"] = wallTime
+    return timing
+
+
+def summarize(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Median of each measurement, so one slow run does not fail the comparison
+    """
+    stageNames = list(dict.fromkeys(name for run in runs for name in run["stages"]))
+    peakMemory = [run["peakMemoryMB"] for run in runs if run["peakMemoryMB"] is not None]
+    return {
+        "wall": statistics.median(run["wall"] for run in runs),
+        "total": statistics.median(run["total"] for run in runs),
+        "peakMemoryMB": max(peakMemory) if peakMemory else None,
+        "stages": {name: statistics.median(run["stages"].get(name, 0.0) for run in runs) for name in stageNames},
+    }
+
+
+def compareBaseline(summary: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    regressions = []
+    limit = 1 + tolerance
+    for name in ["wall", "peakMemoryMB"]:
+        if summary[name] and baseline[name] and summary[name] > baseline[name] * limit:
+            regressions.append(f"{name}: {baseline[name]:.2f} -> {summary[name]:.2f}")
+    for name, seconds in summary["stages"].items():
+        base = baseline["stages"].get(name)
+        # very short stages are mostly noise
+        if base and seconds > 0.05 and seconds > base * limit:
+            regressions.append(f"{name}: {base:.3f}s -> {seconds:.3f}s")
+    return regressions
+
+
+def benchmarkCopyConfig(keys: int, runs: int):
+    """
+    Copy config string replacements on a config with this many passes, each with a replaced value
+    """
+    config = {f"pass_{i}": {"type": f"Pass{i}", "value": f"value-{i}", "ids": list(range(20))} for i in range(keys)}
+    content = json.dumps(config, indent=4)
+    replacements = [Replacement(find=f'"value-{i}"', replace=f'"new-value-{i}"') for i in range(keys)]
+    for name, replace in [("one after another", replaceSequentially), ("at once", replaceStrings)]:
+        seconds = []
+        for _ in range(runs):
+            startTime = time.perf_counter()
+            result = replace(content, replacements, "benchmark.json")
+            seconds.append(time.perf_counter() - startTime)
+        print(f"{keys} replacements in {len(content) / 1024:.0f} KB {name}: {statistics.median(seconds) * 1000:.1f} ms")
+    assert result == replaceSequentially(content, replacements, "benchmark.json")
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark sanitize on a synthetic model lab configs tree")
+    argparser.add_argument("--tree", default=None, type=str, help="Use this tree instead of generating one")
+    argparser.add_argument("--models", default=500, type=int, help="Number of models to generate")
+    argparser.add_argument("--versions", default=1, type=int, help="Number of versions per model to generate")
+    argparser.add_argument("--workflows", default=2, type=int, help="Number of workflows per version to generate")
+    argparser.add_argument("--broken-every", default=5, type=int, help="Make every n-th model invalid, 0 for none")
+    argparser.add_argument("--notebook-output-kb", default=0, type=int, help="Size of image output in notebooks")
+    argparser.add_argument(
+        "--olive", action="store_true", help="Also generate olive examples and check against them with --olive"
+    )
+    argparser.add_argument("--runs", default=3, type=int, help="Number of runs, the median is reported")
+    argparser.add_argument("-j", "--jobs", default=1, type=int, help="Passed to sanitize")
+    argparser.add_argument("--output", default=None, type=str, help="Write the report as json to this file")
+    argparser.add_argument("--baseline", default=None, type=str, help="Report of an earlier run to compare with")
+    argparser.add_argument("--tolerance", default=0.2, type=float, help="Allowed slowdown against the baseline")
+    argparser.add_argument(
+        "--copy-config", default=0, type=int, help="Only time copy config replacements with this many replacements"
+    )
+    args = argparser.parse_args()
+    if args.copy_config:
+        benchmarkCopyConfig(args.copy_config, args.runs)
+        return
+
+    scriptsDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sourceDir = os.path.dirname(scriptsDir)
+    with tempfile.TemporaryDirectory() as tempDir:
+        treeDir = args.tree
+        olivePath = os.path.join(tempDir, "olive") if args.olive else None
+        if not treeDir:
+            treeDir = os.path.join(tempDir, "model_lab_configs")
+            generate(
+                sourceDir,
+                treeDir,
+                args.models,
+                args.versions,
+                args.workflows,
+                args.broken_every,
+                args.notebook_output_kb,
+                olivePath,
+            )
+        runs = []
+        for _ in range(args.runs):
+            # --full fixes the tree, so every run starts from a fresh copy of the untouched one
+            runDir = os.path.join(tempDir, "run", "model_lab_configs")
+            shutil.copytree(treeDir, runDir, symlinks=True)
+            runs.append(runSanitize(scriptsDir, runDir, args.jobs, olivePath))
+            shutil.rmtree(os.path.dirname(runDir))
+
+    summary = summarize(runs)
+    report = {
+        "models": runs[0]["models"],
+        "versions": args.versions,
+        "workflows": args.workflows,
+        "jobs": args.jobs,
+        **summary,
+        "runs": runs,
+    }
+    print(
+        f"{report['models']} models, {args.jobs} job(s): wall {summary['wall']:.2f}s,"
+        f" peak memory {summary['peakMemoryMB'] or 0:.0f} MB"
+    )
+    for name, seconds in summary["stages"].items():
+        print(f"  {name}: {seconds:.3f}s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+            file.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compareBaseline(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -101,6 +101,12 @@ class OliveDeviceTypes(Enum):
     NPU = "npu"
 
 
+class DiagnosticSeverityEnum(Enum):
+    Error = "error"
+    Warning = "warning"
+    Tip = "tip"
+
+
 # Pass name is case insensitive, so we use lower case for all pass names
 class OlivePassNames:
     OnnxConversion = "onnxconversion"
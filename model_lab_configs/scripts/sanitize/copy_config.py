@@ -4,75 +4,144 @@ Copy configuration classes
 
 import json
 import os
-import shutil
-from typing import Any, List, Optional, Union
+import re
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Union
 
 import pydash
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from .base import BaseModelClass
 from .constants import ReplaceTypeEnum
-from .utils import open_ex, printError, printInfo, printProcess
+from .utils import DocumentCache, printError, printInfo, timeStage
 
 
 class Replacement(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     find: str
     replace: Union[str, Any]
     type: Optional[ReplaceTypeEnum] = None
 
 
 class Copy(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     src: str
     dst: str
     replacements: Optional[List[Replacement]] = None
 
 
+@lru_cache(maxsize=None)
+def compileFinds(finds: Tuple[str, ...]) -> re.Pattern:
+    # in a lookahead, so finds overlapping each other are all found
+    return re.compile("(?=(" + "|".join(re.escape(find) for find in finds) + "))")
+
+
+def findOccurrences(content: str, replacements: List[Replacement]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Start and replacement index of every find in content, or None when replacing all at once
+    could give a different result than replacing one after another.
+    That is when finds overlap, or a replacement with the text around it makes a find of a later replacement.
+    """
+    finds = [replacement.find for replacement in replacements]
+    findIndexes = {find: i for i, find in enumerate(finds)}
+    if len(findIndexes) != len(finds) or not all(finds):
+        return None
+    if not all(isinstance(replacement.replace, str) for replacement in replacements):
+        return None
+    # only the longest find is matched at a position
+    if any(find[:end] in findIndexes for find in finds for end in range(1, len(find))):
+        return None
+
+    pattern = compileFinds(tuple(finds))
+    occurrences = [(match.start(), findIndexes[match.group(1)]) for match in pattern.finditer(content)]
+    # a find spans at most this many characters around a replacement
+    context = max(len(find) for find in finds) - 1
+    end = -context
+    for start, i in occurrences:
+        # close occurrences could change the text around each other
+        if start < end + context:
+            return None
+        end = start + len(finds[i])
+        # later finds must not match across the replacement in its context
+        before = content[max(start - context, 0) : start]
+        replaceEnd = len(before) + len(replacements[i].replace)
+        window = before + replacements[i].replace + content[end : end + context]
+        for match in pattern.finditer(window):
+            j = findIndexes[match.group(1)]
+            if j > i and match.start() < replaceEnd and match.start() + len(finds[j]) > len(before):
+                return None
+    return occurrences
+
+
+def replaceSequentially(content: str, replacements: List[Replacement], dst: str) -> str:
+    for replacement in replacements:
+        printInfo(replacement.find)
+        if replacement.find not in content:
+            printError(f"Not in dst file {dst}: {replacement.find}")
+            continue
+        content = content.replace(replacement.find, replacement.replace)
+    return content
+
+
+def replaceStrings(content: str, replacements: List[Replacement], dst: str) -> str:
+    """
+    Replace all finds in one scan with a combined regex, or one after another when the order matters
+    """
+    occurrences = findOccurrences(content, replacements)
+    if occurrences is None:
+        return replaceSequentially(content, replacements, dst)
+    parts = []
+    end = 0
+    for start, i in occurrences:
+        parts.append(content[end:start])
+        parts.append(replacements[i].replace)
+        end = start + len(replacements[i].find)
+    parts.append(content[end:])
+    found = {i for _, i in occurrences}
+    for i, replacement in enumerate(replacements):
+        printInfo(replacement.find)
+        if i not in found:
+            printError(f"Not in dst file {dst}: {replacement.find}")
+    return "".join(parts)
+
+
 class CopyConfig(BaseModelClass):
     copies: List[Copy] = []
 
     @staticmethod
     def Read(copyConfigFile: str):
-        printProcess(copyConfigFile)
-        with open_ex(copyConfigFile, "r") as file:
-            copyConfigContent = file.read()
-        copyConfig = CopyConfig.model_validate_json(copyConfigContent, strict=True)
-        copyConfig._file = copyConfigFile
-        copyConfig._fileContent = copyConfigContent
-        return copyConfig
+        return CopyConfig.ReadFile(copyConfigFile)
 
+    @timeStage("copy config")
     def process(self, modelVerDir: str):
+        """
+        Read each src once, apply string then path replacements in memory and write dst once if it changed
+        """
         if not self.copies:
             return
         for copy in self.copies:
             src = os.path.join(modelVerDir, copy.src)
             dst = os.path.join(modelVerDir, copy.dst)
-            if not os.path.exists(src):
+            if not DocumentCache.Exists(src):
                 printError(f"{src} does not exist")
                 continue
-            shutil.copy(src, dst)
+            content = DocumentCache.ReadText(src)
             if copy.replacements:
                 stringReplacements = [
                     repl for repl in copy.replacements if repl.type == None or repl.type == ReplaceTypeEnum.String
                 ]
                 if stringReplacements:
-                    with open_ex(dst, "r") as file:
-                        content = file.read()
-                    for replacement in stringReplacements:
-                        printInfo(replacement.find)
-                        if replacement.find not in content:
-                            printError(f"Not in dst file {dst}: {replacement.find}")
-                            continue
-                        content = content.replace(replacement.find, replacement.replace)
-                    with open_ex(dst, "w") as file:
-                        file.write(content)
+                    content = replaceStrings(content, stringReplacements, dst)
                 pathReplacements = [
                     repl
                     for repl in copy.replacements
                     if repl.type == ReplaceTypeEnum.Path or repl.type == ReplaceTypeEnum.PathAdd
                 ]
                 if pathReplacements:
-                    with open_ex(dst, "r") as file:
-                        jsonObj = json.load(file)
+                    # parse a new object, the cached one of src is shared
+                    jsonObj = json.loads(content)
                     for replacement in pathReplacements:
                         printInfo(replacement.find)
                         target = pydash.get(jsonObj, replacement.find)
@@ -85,6 +154,5 @@ class CopyConfig(BaseModelClass):
                             printError(f"Not match type in dst json {dst}: {replacement.find}")
                             continue
                         pydash.set_(jsonObj, replacement.find, replacement.replace)
-                    with open_ex(dst, "w") as file:
-                        json.dump(jsonObj, file, indent=4)
-                        file.write("\n")
+                    content = json.dumps(jsonObj, indent=4) + "\n"
+            DocumentCache.Write(dst, content)
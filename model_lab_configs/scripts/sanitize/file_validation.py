@@ -7,7 +7,6 @@ from __future__ import annotations
 import json
 import os
 import re
-import shutil
 from pathlib import Path
 
 from .constants import (
@@ -21,7 +20,7 @@ from .constants import (
     outputModelRelativePath,
 )
 from .model_parameter import ModelParameter
-from .utils import GlobalVars, open_ex, printError, printProcess, printWarning
+from .utils import DocumentCache, GlobalVars, OliveJson, printError, printProcess, printWarning, timeStage
 
 
 def check_case(path: Path) -> bool:
@@ -37,19 +36,18 @@ def check_case(path: Path) -> bool:
     return True
 
 
+@timeStage("gitignore")
 def process_gitignore(modelVerDir: str, configDir: str):
     gitignoreFile = os.path.join(modelVerDir, ".gitignore")
-    GlobalVars.gitignoreCheck.append(gitignoreFile)
+    GlobalVars.AddCheckItem("gitignoreCheck", gitignoreFile)
     templateFile = os.path.join(configDir, "gitignore.md")
-    if not os.path.exists(gitignoreFile):
+    if not DocumentCache.Exists(gitignoreFile):
         printWarning(f"{gitignoreFile} not exists. Copy the template one")
-        shutil.copy(templateFile, gitignoreFile)
+        DocumentCache.Copy(templateFile, gitignoreFile)
     else:
         # Ensure each non-empty line in template is present in the .gitignore file (exact match)
-        with open_ex(gitignoreFile, "r") as file:
-            gitignoreLines = [line.strip() for line in file if line.strip()]
-        with open_ex(templateFile, "r") as file:
-            templateLines = [line.strip() for line in file if line.strip()]
+        gitignoreLines = [line.strip() for line in DocumentCache.ReadText(gitignoreFile).splitlines() if line.strip()]
+        templateLines = [line.strip() for line in DocumentCache.ReadText(templateFile).splitlines() if line.strip()]
         missing = [line for line in templateLines if line not in gitignoreLines]
         for line in missing:
             printError(f"{gitignoreFile} does not have line '{line}'")
@@ -70,15 +68,15 @@ def checkSystem(oliveJsonFile: str, system):
     return True
 
 
+@timeStage("olive json")
 def readCheckOliveConfig(oliveJsonFile: str):
     """
     This will set phases to modelParameter
     """
-    GlobalVars.oliveJsonCheck.append(oliveJsonFile)
+    GlobalVars.AddCheckItem("oliveJsonCheck", oliveJsonFile)
 
     printProcess(oliveJsonFile)
-    with open_ex(oliveJsonFile, "r") as file:
-        oliveJson = json.load(file)
+    oliveJson = DocumentCache.ReadJson(oliveJsonFile)
     # check if engine is in oliveJson
     if OlivePropertyNames.Engine in oliveJson:
         printError(f"{oliveJsonFile} has engine. Should place in the root instead")
@@ -138,21 +136,59 @@ def readCheckOliveConfig(oliveJsonFile: str):
             jsonUpdated = True
 
     if jsonUpdated:
-        with open_ex(oliveJsonFile, "w") as file:
-            json.dump(oliveJson, file, indent=4)
-            file.write("\n")
-    return oliveJson
+        DocumentCache.Write(oliveJsonFile, json.dumps(oliveJson, indent=4) + "\n")
+    return OliveJson(oliveJson)
 
 
+def compileSourcePattern(pattern: str) -> re.Pattern[str]:
+    """
+    Patterns are written against the raw notebook json, where quotes in cell sources are escaped
+    """
+    return re.compile(pattern.replace(r"\\\"", '"'))
+
+
+ipynbPatterns = {
+    pattern: compileSourcePattern(pattern)
+    for pattern in [
+        outputModelRelativePath,
+        outputModelIntelNPURelativePath,
+        outputModelModelBuilderPath,
+        importOnnxruntime,
+        importOnnxgenairuntime,
+    ]
+}
+
+
+def readIpynbSource(ipynbFile: str) -> str | None:
+    """
+    Cell sources of the notebook joined together. Outputs like base64 images are left out
+    """
+    try:
+        # not cached, as only the sources are used
+        notebook = json.loads(DocumentCache.ReadText(ipynbFile, keep=False))
+    except json.JSONDecodeError:
+        printError(f"{ipynbFile} is not a valid notebook")
+        return None
+    sources = []
+    for cell in notebook.get("cells", []):
+        source = cell.get("source", "")
+        sources.append(source if isinstance(source, str) else "".join(source))
+    return "\n".join(sources)
+
+
+@timeStage("ipynb")
 def readCheckIpynb(ipynbFile: str, modelItems: dict[str, ModelParameter]):
     """
     Note this return exists or not, not valid or not
     """
-    if os.path.exists(ipynbFile):
-        GlobalVars.ipynbCheck.append(ipynbFile)
+    if DocumentCache.Exists(ipynbFile):
+        GlobalVars.AddCheckItem("ipynbCheck", ipynbFile)
 
-        with open_ex(ipynbFile, "r") as file:
-            ipynbContent: str = file.read()
+        ipynbSource = readIpynbSource(ipynbFile)
+        if ipynbSource is None:
+            return True
+        # workflows sharing the notebook mostly need the same patterns, so search each one once
+        patternFound: dict[str, bool] = {}
         allRuntimes: list[str] = []
         for name, modelParameter in modelItems.items():
             testPath = outputModelRelativePath
@@ -163,7 +199,9 @@ def readCheckIpynb(ipynbFile: str, modelItems: dict[str, ModelParameter]):
             elif modelParameter.runtime.values and modelParameter.isIntel:
                 testPath = outputModelIntelNPURelativePath
             for item in [testPath, importStr]:
-                if not re.search(item, ipynbContent):
+                if item not in patternFound:
+                    patternFound[item] = ipynbPatterns[item].search(ipynbSource) is not None
+                if not patternFound[item]:
                     printError(f"{ipynbFile} does not have '{item}' for {name}, please use it as input")
             if modelParameter.evalRuntime:
                 runtime = GlobalVars.RuntimeToEPName[modelParameter.evalRuntime]
@@ -192,26 +230,27 @@ def readCheckIpynb(ipynbFile: str, modelItems: dict[str, ModelParameter]):
             else:
                 targetEP = allRuntimes[0]
         if targetEP:
-            targetStr = f'ExecutionProvider=\\"{targetEP}\\"'
-            if ipynbContent.count(targetStr) != 1:
-                printError(f"{ipynbFile} should have 1 {targetStr}")
+            targetStr = f'ExecutionProvider="{targetEP}"'
+            if ipynbSource.count(targetStr) != 1:
+                # as it is written in the notebook file
+                printError(f'{ipynbFile} should have 1 ExecutionProvider=\\"{targetEP}\\"')
         else:
             printError(f"{ipynbFile} has no runtime for it!")
         return True
     return False
 
 
+@timeStage("requirements")
 def readCheckRequirements(requirementsFile: str):
     """
     Check requirements.txt file
     """
-    if not os.path.exists(requirementsFile):
+    if not DocumentCache.Exists(requirementsFile):
         printWarning(f"{requirementsFile} not exists.")
         return
 
-    GlobalVars.requirementsCheck.append(requirementsFile)
-    with open_ex(requirementsFile, "r") as file:
-        requirementsContent: str = file.read()
+    GlobalVars.AddCheckItem("requirementsCheck", requirementsFile)
+    requirementsContent: str = DocumentCache.ReadText(requirementsFile)
     requirementsLines = requirementsContent.splitlines()
 
     oldContents = []
@@ -231,5 +270,4 @@ def readCheckRequirements(requirementsFile: str):
         requirementsLines = newContents + requirementsLines
     newContent = "\n".join(requirementsLines) + "\n"
     if requirementsContent != newContent:
-        with open_ex(requirementsFile, "w") as file:
-            file.write(newContent)
+        DocumentCache.Write(requirementsFile, newContent)
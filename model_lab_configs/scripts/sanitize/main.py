@@ -5,21 +5,43 @@ Main sanitize script
 from __future__ import annotations
 
 import argparse
-import copy
+import importlib
 import json
 import os
-import subprocess
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional
+
+from pydantic import TypeAdapter
 
 from .base import BaseModelClass
-from .constants import EPNames, ModelStatusEnum
+from .constants import DiagnosticSeverityEnum, EPNames, ModelStatusEnum
 from .copy_config import CopyConfig
 from .file_validation import check_case, process_gitignore, readCheckIpynb, readCheckOliveConfig, readCheckRequirements
-from .model_info import ModelInfo, ModelList
+from .manifest import Manifest, getGlobalKey, hashModelDir, manifestFileName
+from .model_info import ModelInfo, ModelList, ModelTaskResult
 from .model_parameter import ModelParameter
-from .parameters import readCheckParameterTemplate
+from .parameters import Parameter, readCheckParameterTemplate
 from .project_config import ModelInfoProject, ModelProjectConfig
-from .utils import GlobalVars, open_ex, printError, printWarning
+from .utils import (
+    Diagnostic,
+    DocumentCache,
+    GlobalVars,
+    JournalEntry,
+    addDiagnostic,
+    open_ex,
+    printError,
+    printWarning,
+    recordTask,
+    reportDiagnostics,
+    timeStage,
+)
+from .watch import ChangeWatcher
+
+# not available on Windows
+resource = importlib.import_module("resource") if sys.platform != "win32" else None
 
 
 def shouldCheckModel(configDir: str, model: ModelInfo) -> str | None:
@@ -30,6 +52,297 @@ def shouldCheckModel(configDir: str, model: ModelInfo) -> str | None:
     return None
 
 
+def checkModel(
+    configDir: str, modelDir: str, model: ModelInfo, modelList: ModelList, parameterTemplate: dict[str, Parameter]
+):
+    """
+    Check and update all versions of one model. Sets model.version and may update model.runtimes.
+    """
+    if not check_case(Path(modelDir)):
+        printError(
+            f"Model folder does not exist, or check if case matches between model.id {model.id} and model folder."
+        )
+
+    # get all versions
+    allVersions = [int(name) for name in os.listdir(modelDir) if os.path.isdir(os.path.join(modelDir, name))]
+    model.version = allVersions[-1]
+    # check if version is continuous
+    if len(allVersions) != 1:
+        printError(f"{modelDir} has wrong versions {allVersions}")
+
+    # process each version
+    for version in allVersions:
+        # shallow copy for version usage, it is only read
+        modelInVersion = model.model_copy(update={"version": version})
+        modelVerDir = os.path.join(modelDir, str(version))
+
+        # process copy
+        copyConfigFile = os.path.join(modelVerDir, "_copy.json.config")
+        if DocumentCache.Exists(copyConfigFile):
+            copyConfig = CopyConfig.Read(copyConfigFile)
+            copyConfig.process(modelVerDir)
+            copyConfig.writeIfChanged()
+
+        # get model space config
+        modelSpaceConfig = ModelProjectConfig.Read(os.path.join(modelVerDir, "model_project.config"))
+        modelSpaceConfig.modelInfo.version = int(os.path.basename(modelVerDir))
+
+        # check md
+        mdFile = os.path.join(modelVerDir, "README.md")
+        if not DocumentCache.Exists(mdFile):
+            printError(f"{mdFile} not exists")
+
+        # check requirement.txt
+        if not model.extension:
+            requirementFile = os.path.join(modelVerDir, "requirements.txt")
+            readCheckRequirements(requirementFile)
+
+        # copy .gitignore
+        if not model.extension:
+            process_gitignore(modelVerDir, configDir)
+
+        # check ipynb & parameter
+        sharedIpynbFile = os.path.join(modelVerDir, "inference_sample.ipynb")
+        hasSharedIpynb = DocumentCache.Exists(sharedIpynbFile)
+        workflowsAgainstShared: dict[str, ModelParameter] = {}
+
+        if modelSpaceConfig.modelInfo:
+            modelSpaceConfig.modelInfo.id = modelInVersion.id
+        else:
+            modelSpaceConfig.modelInfo = ModelInfoProject(id=modelInVersion.id)
+
+        hasLLM = False
+        for _, modelItem in enumerate(modelSpaceConfig.workflows):
+            # set template
+            fileName = os.path.basename(modelItem.file)[:-5]
+            modelItem.templateName = fileName
+
+            # read parameter
+            modelParameter = ModelParameter.Read(os.path.join(modelVerDir, f"{modelItem.file}.config"))
+
+            # check olive json
+            oliveJsonFile = os.path.join(modelVerDir, modelItem.file)
+            oliveJson = readCheckOliveConfig(oliveJsonFile)
+            if not oliveJson:
+                printError(f"{oliveJsonFile} not exists or is not a valid olive json file")
+                continue
+
+            # check parameter
+            modelParameter.Check(parameterTemplate, oliveJson, modelList)
+            if modelParameter.isIntel:
+                tmpDevices = modelParameter.getIntelDevices()
+                # Remove items containing "intel" (case-insensitive) from runtime values
+                filteredValues = [v for v in model.runtimes if "intel" not in v.value.lower()]
+                # Add Intel runtime values
+                intelRuntimes = [
+                    GlobalVars.GetRuntimeRPC(EPNames.OpenVINOExecutionProvider, device) for device in tmpDevices
+                ]
+                filteredValues.extend([runtime for runtime in intelRuntimes])
+                model.runtimes = filteredValues
+
+            hasLLM = hasLLM or modelParameter.isLLM
+
+            # check ipynb
+            if not model.extension:
+                # although filename and templateName are same here, use fileName to align with Skylight implementation
+                ipynbFile = os.path.join(modelVerDir, f"{fileName}_inference_sample.ipynb")
+                hasSpecialIpynb = readCheckIpynb(ipynbFile, {modelItem.file: modelParameter})
+                if not hasSpecialIpynb:
+                    if not hasSharedIpynb:
+                        printError(f"{ipynbFile} nor {sharedIpynbFile} not exists.")
+                    else:
+                        workflowsAgainstShared[modelItem.file] = modelParameter
+
+        if not model.extension:
+            readCheckIpynb(sharedIpynbFile, workflowsAgainstShared)
+
+        if model.extension:
+            GlobalVars.AddCount("extensionCheck")
+
+        modelSpaceConfig.Check(modelInVersion)
+
+        if hasLLM:
+            # check inference_model.json
+            inferenceModelFile = os.path.join(modelVerDir, "inference_model.json")
+            if not DocumentCache.Exists(inferenceModelFile):
+                printWarning(f"{inferenceModelFile} not exists.")
+            else:
+                GlobalVars.AddCheckItem("inferenceModelCheck", inferenceModelFile)
+                fileContent = DocumentCache.ReadText(inferenceModelFile)
+                inferenceModelData = json.loads(fileContent)
+                tmpModelName = modelInVersion.id.split("/")[-1]
+                inferenceModelData["Name"] = tmpModelName
+                # Write back to file
+                newContent = json.dumps(inferenceModelData, indent=4, ensure_ascii=False)
+                BaseModelClass.writeJsonIfChanged(newContent, inferenceModelFile, fileContent)
+
+
+class _WorkerState:
+    configDir: str = ""
+    modelList: Optional[ModelList] = None
+    parameterTemplate: dict[str, Parameter] = {}
+
+
+def initWorker(
+    verbose: bool, olivePath: str, configDir: str, modelList: ModelList, parameterTemplate: dict[str, Parameter]
+):
+    GlobalVars.verbose = verbose
+    GlobalVars.olivePath = olivePath
+    _WorkerState.configDir = configDir
+    _WorkerState.modelList = modelList
+    _WorkerState.parameterTemplate = parameterTemplate
+
+
+def checkModelTask(
+    configDir: str, modelDir: str, model: ModelInfo, modelList: ModelList, parameterTemplate: dict[str, Parameter]
+) -> ModelTaskResult:
+    """
+    Check one model with its output recorded instead of printed, so results can be applied in model order
+    and saved to the manifest.
+    """
+    stageTimes = GlobalVars.stageTimes
+    GlobalVars.stageTimes = {}
+    try:
+        with recordTask() as output:
+            checkModel(configDir, modelDir, model, modelList, parameterTemplate)
+        taskStageTimes = GlobalVars.stageTimes
+    finally:
+        GlobalVars.stageTimes = stageTimes
+    return ModelTaskResult(output=output, version=model.version, runtimes=model.runtimes, stageTimes=taskStageTimes)
+
+
+def runModelTask(index: int, modelDir: str) -> ModelTaskResult:
+    modelList = _WorkerState.modelList
+    model = modelList.allModels()[index]
+    result = checkModelTask(_WorkerState.configDir, modelDir, model, modelList, _WorkerState.parameterTemplate)
+    # files are written by the main process
+    DocumentCache.DiscardPending()
+    return result
+
+
+def getPeakMemory() -> float | None:
+    """
+    Peak resident memory in MB of this process and its finished workers, None if not supported (Windows)
+    """
+    if resource is None:
+        return None
+    # KB on Linux
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage = max(usage, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return usage / 1024
+
+
+def reportTiming(totalTime: float, models: int, cachedModels: int, jobs: int, timingOutput: str | None):
+    peakMemory = getPeakMemory()
+    if timingOutput:
+        with open(timingOutput, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "total": totalTime,
+                    "models": models,
+                    "cachedModels": cachedModels,
+                    "jobs": jobs,
+                    "peakMemoryMB": peakMemory,
+                    "stages": GlobalVars.stageTimes,
+                },
+                file,
+                indent=4,
+            )
+            file.write("\n")
+    else:
+        print(f"Total {totalTime:.2f}s, peak memory {peakMemory or 0:.0f} MB")
+        # stages inside model checks are summed over workers, so could be more than models stage with jobs > 1
+        for name, seconds in GlobalVars.stageTimes.items():
+            print(f"  {name}: {seconds:.3f}s")
+
+
+def reportWatchError(filePath: str, error: Exception):
+    """
+    Report a file that could not be checked, like a config saved half way, as an error of that file
+    """
+    msg = " ".join(line.strip() for line in str(error).splitlines())
+    addDiagnostic(
+        Diagnostic(
+            severity=DiagnosticSeverityEnum.Error,
+            msg=f"Failed to check: {type(error).__name__}: {msg}",
+            filename=filePath,
+            lineno=1,
+        )
+    )
+
+
+def watchModels(configDir: str, modelList: ModelList, parameterTemplate: dict[str, Parameter], outputFile: str | None):
+    """
+    Keep the model list and parameter template in memory and check a model again when its files change.
+    A change of files shared by all models reloads them and checks all models.
+    """
+    globalFiles = [
+        os.path.normpath(os.path.join(configDir, name))
+        for name in ["model_list.json", "parameter_template.json", "gitignore.md"]
+    ]
+
+    def getModelDirs() -> dict[str, ModelInfo]:
+        modelDirs = [(shouldCheckModel(configDir, model), model) for model in modelList.allModels()]
+        return {os.path.normpath(modelDir): model for modelDir, model in modelDirs if modelDir}
+
+    modelDirs = getModelDirs()
+    watcher = ChangeWatcher(configDir, globalFiles + list(modelDirs))
+    watcher.Start()
+    method = "polling" if watcher.usePolling else "file system events"
+    print(f"Watching {len(modelDirs)} models in {configDir} with {method}, press Ctrl+C to stop")
+    try:
+        while True:
+            changes = watcher.Wait()
+            startTime = time.perf_counter()
+            GlobalVars.errorList = []
+            GlobalVars.diagnostics = []
+            changedGlobalFiles = sorted(path for path in changes if path in globalFiles)
+            if changedGlobalFiles:
+                try:
+                    newModelList = ModelList.Read(configDir)
+                    parameterTemplate = readCheckParameterTemplate(os.path.join(configDir, "parameter_template.json"))
+                except Exception as e:
+                    # keep the last good ones until the file is fixed
+                    reportWatchError(changedGlobalFiles[0], e)
+                    reportDiagnostics(outputFile)
+                    continue
+                modelList = newModelList
+                modelDirs = getModelDirs()
+                watcher.folders = globalFiles + list(modelDirs)
+                changedModels = modelDirs
+            else:
+                changedModels = {
+                    modelDir: model
+                    for modelDir, model in modelDirs.items()
+                    if any(path.startswith(modelDir + os.sep) for path in changes)
+                }
+            if not changedModels:
+                continue
+
+            for modelDir, model in changedModels.items():
+                pending = dict(DocumentCache.pending)
+                try:
+                    result = checkModelTask(configDir, modelDir, model, modelList, parameterTemplate)
+                except Exception as e:
+                    # fixes written before the failure are not applied
+                    DocumentCache.pending = pending
+                    modelChanges = sorted(path for path in changes if path.startswith(modelDir + os.sep))
+                    reportWatchError(modelChanges[0] if modelChanges else modelDir, e)
+                    continue
+                result.output.apply()
+                model.version = result.version
+                model.runtimes = result.runtimes
+            modelList.Check()
+            # do not check again for our own fixes
+            watcher.Ignore(DocumentCache.Flush(configDir))
+            reportDiagnostics(outputFile)
+            print(f"Checked {len(changedModels)} model(s) in {(time.perf_counter() - startTime) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.Stop()
+
+
 def main():
     argparser = argparse.ArgumentParser(description="Check model lab configs")
     argparser.add_argument("-v", "--verbose", action="store_true", help="Verbose mode")
@@ -40,165 +353,171 @@ def main():
         type=str,
         help="Path to olive repo to check json files",
     )
+    argparser.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        type=int,
+        help="Number of worker processes to check models with. Output is the same as with 1",
+    )
+    argparser.add_argument(
+        "--full",
+        action="store_true",
+        help=f"Check all models, even those whose files did not change since the last run recorded in {manifestFileName}",
+    )
+    argparser.add_argument("--timing", action="store_true", help="Print time spent in each stage and peak memory")
+    argparser.add_argument(
+        "--timing-output", default=None, type=str, help="Write --timing results as json to this file instead"
+    )
+    argparser.add_argument(
+        "--config-dir",
+        default=None,
+        type=str,
+        help="model_lab_configs folder to check, defaults to the one containing these scripts",
+    )
+    argparser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print a unified diff of files that would be changed instead of writing them, and exit with 1 if any",
+    )
+    argparser.add_argument(
+        "--journal",
+        default=None,
+        type=str,
+        help="Write the paths changed by this run with sha256 before and after as json to this file",
+    )
+    argparser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After checking all models, keep running and check models again when their files change",
+    )
+    argparser.add_argument(
+        "--format",
+        default="text",
+        choices=["text", "json", "sarif"],
+        help="Output format of errors, warnings and tips",
+    )
+    argparser.add_argument("--output", default=None, type=str, help="File to write json or sarif output to")
+    argparser.add_argument(
+        "--severity",
+        default=DiagnosticSeverityEnum.Tip.value,
+        choices=[severity.value for severity in DiagnosticSeverityEnum],
+        help="Only report diagnostics of this severity or higher",
+    )
     args = argparser.parse_args()
     GlobalVars.verbose = args.verbose
     GlobalVars.olivePath = args.olive
+    GlobalVars.diagnosticFormat = args.format
+    GlobalVars.minSeverity = DiagnosticSeverityEnum(args.severity)
+    DocumentCache.dryRun = args.dry_run
 
+    runStartTime = time.perf_counter()
     # need to resolve due to d:\ vs D:\
-    configDir = str(Path(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))).resolve(strict=False))
+    configDir = str(
+        Path(args.config_dir or os.path.dirname(os.path.dirname(os.path.dirname(__file__)))).resolve(strict=False)
+    )
+    scriptsDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Results of unchanged models are reused from last run. Olive examples are not tracked, so always check all with them
+    useManifest = not GlobalVars.olivePath
+    with timeStage("manifest"):
+        globalKey = getGlobalKey(configDir, scriptsDir, [args.verbose])
+        manifest = (
+            Manifest.Read(configDir, globalKey) if useManifest and not args.full else Manifest(globalKey=globalKey)
+        )
+        newManifest = Manifest(globalKey=globalKey)
 
     # get model list
-    modelList = ModelList.Read(configDir)
+    with timeStage("model list"):
+        modelList = ModelList.Read(configDir)
     # check parameter template
-    parameterTemplate = readCheckParameterTemplate(os.path.join(configDir, "parameter_template.json"))
+    with timeStage("parameter template"):
+        parameterTemplate = readCheckParameterTemplate(os.path.join(configDir, "parameter_template.json"))
 
     # check each model
-    for model in modelList.allModels():
-        modelDir = shouldCheckModel(configDir, model)
-        if modelDir:
-            if not check_case(Path(modelDir)):
-                printError(
-                    f"Model folder does not exist, or check if case matches between model.id {model.id} and model folder."
-                )
-
-            # get all versions
-            allVersions = [int(name) for name in os.listdir(modelDir) if os.path.isdir(os.path.join(modelDir, name))]
-            model.version = allVersions[-1]
-            # check if version is continuous
-            if len(allVersions) != 1:
-                printError(f"{modelDir} has wrong versions {allVersions}")
-
-            # process each version
-            for version in allVersions:
-                # deep copy model for version usage
-                modelInVersion = copy.deepcopy(model)
-                modelInVersion.version = version
-                modelVerDir = os.path.join(modelDir, str(version))
-
-                # process copy
-                copyConfigFile = os.path.join(modelVerDir, "_copy.json.config")
-                if os.path.exists(copyConfigFile):
-                    copyConfig = CopyConfig.Read(copyConfigFile)
-                    copyConfig.process(modelVerDir)
-                    copyConfig.writeIfChanged()
-
-                # get model space config
-                modelSpaceConfig = ModelProjectConfig.Read(os.path.join(modelVerDir, "model_project.config"))
-                modelSpaceConfig.modelInfo.version = int(os.path.basename(modelVerDir))
-
-                # check md
-                mdFile = os.path.join(modelVerDir, "README.md")
-                if not os.path.exists(mdFile):
-                    printError(f"{mdFile} not exists")
-
-                # check requirement.txt
-                if not model.extension:
-                    requirementFile = os.path.join(modelVerDir, "requirements.txt")
-                    readCheckRequirements(requirementFile)
-
-                # copy .gitignore
-                if not model.extension:
-                    process_gitignore(modelVerDir, configDir)
-
-                # check ipynb & parameter
-                sharedIpynbFile = os.path.join(modelVerDir, "inference_sample.ipynb")
-                hasSharedIpynb = os.path.exists(sharedIpynbFile)
-                workflowsAgainstShared: dict[str, ModelParameter] = {}
-
-                if modelSpaceConfig.modelInfo:
-                    modelSpaceConfig.modelInfo.id = modelInVersion.id
-                else:
-                    modelSpaceConfig.modelInfo = ModelInfoProject(id=modelInVersion.id)
-
-                hasLLM = False
-                for _, modelItem in enumerate(modelSpaceConfig.workflows):
-                    # set template
-                    fileName = os.path.basename(modelItem.file)[:-5]
-                    modelItem.templateName = fileName
-
-                    # read parameter
-                    modelParameter = ModelParameter.Read(os.path.join(modelVerDir, f"{modelItem.file}.config"))
-
-                    # check olive json
-                    oliveJsonFile = os.path.join(modelVerDir, modelItem.file)
-                    oliveJson = readCheckOliveConfig(oliveJsonFile)
-                    if not oliveJson:
-                        printError(f"{oliveJsonFile} not exists or is not a valid olive json file")
-                        continue
-
-                    # check parameter
-                    modelParameter.Check(parameterTemplate, oliveJson, modelList)
-                    if modelParameter.isIntel:
-                        tmpDevices = modelParameter.getIntelDevices()
-                        # Remove items containing "intel" (case-insensitive) from runtime values
-                        filteredValues = [v for v in model.runtimes if "intel" not in v.value.lower()]
-                        # Add Intel runtime values
-                        intelRuntimes = [
-                            GlobalVars.GetRuntimeRPC(EPNames.OpenVINOExecutionProvider, device) for device in tmpDevices
-                        ]
-                        filteredValues.extend([runtime for runtime in intelRuntimes])
-                        model.runtimes = filteredValues
-
-                    hasLLM = hasLLM or modelParameter.isLLM
-
-                    # check ipynb
-                    if not model.extension:
-                        # although filename and templateName are same here, use fileName to align with Skylight implementation
-                        ipynbFile = os.path.join(modelVerDir, f"{fileName}_inference_sample.ipynb")
-                        hasSpecialIpynb = readCheckIpynb(ipynbFile, {modelItem.file: modelParameter})
-                        if not hasSpecialIpynb:
-                            if not hasSharedIpynb:
-                                printError(f"{ipynbFile} nor {sharedIpynbFile} not exists.")
-                            else:
-                                workflowsAgainstShared[modelItem.file] = modelParameter
-
-                if not model.extension:
-                    readCheckIpynb(sharedIpynbFile, workflowsAgainstShared)
-
-                if model.extension:
-                    GlobalVars.extensionCheck += 1
-
-                modelSpaceConfig.Check(modelInVersion)
-
-                if hasLLM:
-                    # check inference_model.json
-                    inferenceModelFile = os.path.join(modelVerDir, "inference_model.json")
-                    if not os.path.exists(inferenceModelFile):
-                        printWarning(f"{inferenceModelFile} not exists.")
-                    else:
-                        GlobalVars.inferenceModelCheck.append(inferenceModelFile)
-                        with open_ex(inferenceModelFile, "r") as file:
-                            fileContent = file.read()
-                            inferenceModelData = json.loads(fileContent)
-                        tmpModelName = modelInVersion.id.split("/")[-1]
-                        inferenceModelData["Name"] = tmpModelName
-                        # Write back to file
-                        newContent = json.dumps(inferenceModelData, indent=4, ensure_ascii=False)
-                        BaseModelClass.writeJsonIfChanged(newContent, inferenceModelFile, fileContent)
-
-    modelList.Check()
+    startTime = time.perf_counter()
+    models = [(index, model, shouldCheckModel(configDir, model)) for index, model in enumerate(modelList.allModels())]
+    models = [(index, model, modelDir) for index, model, modelDir in models if modelDir]
+    executor = None
+    if args.jobs > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=initWorker,
+            initargs=(args.verbose, args.olive, configDir, modelList, parameterTemplate),
+        )
+    try:
+        tasks = []
+        for index, model, modelDir in models:
+            key = hashModelDir(modelDir)
+            result = manifest.Get(model.id, key)
+            if result is None and executor:
+                result = executor.submit(runModelTask, index, modelDir)
+            tasks.append((model, modelDir, key, result))
+
+        # apply in model order so errors and checks.json match a serial full run
+        cachedModels = 0
+        for model, modelDir, key, result in tasks:
+            cached = False
+            if result is None:
+                result = checkModelTask(configDir, modelDir, model, modelList, parameterTemplate)
+            elif isinstance(result, Future):
+                result = result.result()
+            else:
+                cached = True
+                cachedModels += 1
+            if not cached:
+                for name, seconds in result.stageTimes.items():
+                    GlobalVars.stageTimes[name] = GlobalVars.stageTimes.get(name, 0.0) + seconds
+            result.output.apply()
+            model.version = result.version
+            model.runtimes = result.runtimes
+            # only keep results of models not changed by this run, otherwise the next run could differ
+            if not result.output.hasWrites():
+                newManifest.Set(model.id, key, result)
+    finally:
+        if executor:
+            executor.shutdown()
+    GlobalVars.stageTimes["models"] = time.perf_counter() - startTime
+    if args.timing:
+        print(
+            f"Checked {len(models)} models ({cachedModels} unchanged) in {GlobalVars.stageTimes['models']:.2f}s"
+            f" with {args.jobs} job(s)"
+        )
+
+    with timeStage("model list check"):
+        modelList.Check()
 
     if GlobalVars.olivePath:
         printWarning(f"Total {GlobalVars.oliveCheck} config files checked against olive json files")
 
     GlobalVars.Check(configDir)
+    with timeStage("flush"):
+        DocumentCache.Flush(configDir)
 
-    result = subprocess.run(
-        ["git", "status", "--porcelain"],
-        cwd=configDir,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+    if useManifest and not args.dry_run:
+        with timeStage("manifest"):
+            # model_list.json may be updated by this run, then check all models next time
+            if getGlobalKey(configDir, scriptsDir, [args.verbose]) != globalKey:
+                newManifest.models = {}
+            newManifest.Write(configDir)
 
     if len(GlobalVars.errorList) == 0:
-        # If the output is not empty, there are uncommitted changes
-        if bool(result.stdout.strip()):
+        # Files fixed by this run are not committed yet
+        if DocumentCache.journal:
             printError("Please commit changes!")
 
-    for filename, lineno, msg in GlobalVars.errorList:
-        # Red text, with file and line number, clickable in terminal
-        print(f"\033[31mERROR: {filename}:{lineno}: {msg}\033[0m")
+    reportDiagnostics(args.output)
+    if args.journal:
+        with open_ex(args.journal, "w") as file:
+            file.write(TypeAdapter(List[JournalEntry]).dump_json(DocumentCache.journal, indent=4).decode() + "\n")
+
+    if args.timing or args.timing_output:
+        reportTiming(time.perf_counter() - runStartTime, len(models), cachedModels, args.jobs, args.timing_output)
+    if args.dry_run and DocumentCache.journal:
+        sys.exit(1)
+
+    if args.watch:
+        watchModels(configDir, modelList, parameterTemplate, args.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Manifest of input hashes and check results for incremental sanitize runs
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from .model_info import ModelTaskResult
+from .utils import open_ex, printInfo
+
+manifestFileName = ".sanitize_manifest.json"
+# Bump when the manifest format changes
+manifestVersion = 1
+
+
+def hashFiles(files: List[str], root: str) -> str:
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(os.path.relpath(file, root).replace("\\", "/").encode())
+        digest.update(b"\0")
+        if os.path.isfile(file):
+            with open(file, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hashModelDir(modelDir: str) -> str:
+    """
+    Hash all files of a model: model_project.config, *.json.config, olive json, ipynb, requirements etc.
+    """
+    files = []
+    for root, dirs, names in os.walk(modelDir):
+        dirs.sort()
+        files.extend(os.path.join(root, name) for name in sorted(names))
+    return hashFiles(files, modelDir)
+
+
+def getGlobalKey(configDir: str, scriptsDir: str, args: List[Any]) -> str:
+    """
+    Hash inputs shared by all models. If any of them changes, every model is checked again.
+    """
+    files = [os.path.join(configDir, name) for name in ["model_list.json", "parameter_template.json", "gitignore.md"]]
+    # checks change together with the scripts
+    files += sorted(glob.glob(os.path.join(scriptsDir, "sanitize", "*.py")))
+    files += sorted(glob.glob(os.path.join(scriptsDir, "model_lab", "*.py")))
+    return hashFiles(files, configDir) + ":" + hashlib.sha256(json.dumps(args).encode()).hexdigest()
+
+
+class ManifestEntry(BaseModel):
+    key: str
+    result: ModelTaskResult
+
+
+class Manifest(BaseModel):
+    version: int = manifestVersion
+    globalKey: str = ""
+    models: Dict[str, ManifestEntry] = {}
+
+    @staticmethod
+    def Read(configDir: str, globalKey: str) -> Manifest:
+        """
+        Read the manifest of last run. Returns an empty one if it is missing, outdated or made with other global inputs.
+        """
+        manifestFile = os.path.join(configDir, manifestFileName)
+        if os.path.exists(manifestFile):
+            try:
+                with open_ex(manifestFile, "r") as file:
+                    manifest = Manifest.model_validate_json(file.read())
+                if manifest.version == manifestVersion and manifest.globalKey == globalKey:
+                    return manifest
+                printInfo(f"{manifestFile} is outdated, check all models")
+            except ValidationError:
+                printInfo(f"{manifestFile} is invalid, check all models")
+        return Manifest(globalKey=globalKey)
+
+    def Write(self, configDir: str):
+        with open_ex(os.path.join(configDir, manifestFileName), "w") as file:
+            file.write(self.model_dump_json())
+
+    def Get(self, modelId: str, key: str) -> Optional[ModelTaskResult]:
+        entry = self.models.get(modelId)
+        if entry and entry.key == key:
+            return entry.result
+        return None
+
+    def Set(self, modelId: str, key: str, result: ModelTaskResult):
+        self.models[modelId] = ManifestEntry(key=key, result=result)
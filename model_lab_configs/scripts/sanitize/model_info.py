@@ -13,7 +13,7 @@ from pydantic import BaseModel
 
 from .base import BaseModelClass
 from .constants import ArchitectureEnum, IconEnum, ModelStatusEnum
-from .utils import GlobalVars, open_ex, printError, printProcess
+from .utils import GlobalVars, TaskOutput, printError
 
 # This file is import by others
 # To avoid circular import issues, we should carefully manage imports
@@ -57,6 +57,17 @@ class ModelInfo(BaseModel):
             return (lowerName, 0)
 
 
+class ModelTaskResult(BaseModel):
+    """
+    Recorded output of checking one model and the model info fields it updates
+    """
+
+    output: TaskOutput
+    version: int
+    runtimes: List[RuntimeEnum]
+    stageTimes: Dict[str, float] = {}
+
+
 class ModelList(BaseModelClass):
     models: List[ModelInfo]
     template_models: List[ModelInfo]
@@ -75,13 +86,7 @@ class ModelList(BaseModelClass):
     @staticmethod
     def Read(scriptFolder: str):
         modelListFile = os.path.join(scriptFolder, "model_list.json")
-        printProcess(modelListFile)
-        with open_ex(modelListFile, "r") as file:
-            modelListContent = file.read()
-        modelList = ModelList.model_validate_json(modelListContent, strict=True)
-        modelList._file = modelListFile
-        modelList._fileContent = modelListContent
-        return modelList
+        return ModelList.ReadFile(modelListFile)
 
     def allModels(self):
         return self.models + self.template_models
@@ -4,6 +4,7 @@ Model parameter configuration classes
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import re
@@ -11,7 +12,7 @@ from typing import Any, Dict, Iterator, List, Optional
 
 from deepdiff import DeepDiff
 from model_lab import RuntimeEnum, RuntimeFeatureEnum
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from .base import BaseModelClass
 from .constants import (
@@ -26,10 +27,12 @@ from .constants import (
 )
 from .model_info import ModelList
 from .parameters import Parameter, ParameterAction
-from .utils import GlobalVars, checkPath, get_target_system, open_ex, printError, printProcess, printWarning
+from .utils import DocumentCache, GlobalVars, checkPath, get_target_system, printError, printWarning, timeStage
 
 
 class RuntimeOverwrite(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     # This tag is only used for the case that when we edit the json, we know the property is auto generated by sanitize.py so no need to care about it
     autoGenerated: Optional[bool] = None
     pyEnvPath: Optional[str] = None
@@ -116,6 +119,8 @@ class Section(BaseModel):
 
 
 class ADMNPUConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     inferenceSettings: Optional[Any] = None
 
 
@@ -183,6 +188,77 @@ class DebugInfo(BaseModel):
         return not (self.useModelBuilder or self.useOpenVINOConversion or self.useOpenVINOOptimumConversion)
 
 
+def canonicalHash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class OliveExamples:
+    """
+    Passes of upstream olive examples and their diffs against our passes, computed once per process
+    """
+
+    # oliveFile: (passes, canonical hash)
+    examples: dict[str, tuple[Any, str]] = {}
+    # (oliveFile, canonical hash of our passes): filtered diff
+    diffs: dict[tuple[str, str], Any] = {}
+
+    @classmethod
+    def GetExample(cls, oliveFile: str) -> tuple[Any, str]:
+        if oliveFile not in cls.examples:
+            oliveFileJson = DocumentCache.ReadJson(os.path.join(GlobalVars.olivePath, "examples", oliveFile))
+            passes = oliveFileJson[OlivePropertyNames.Passes]
+            cls.examples[oliveFile] = (passes, canonicalHash(passes))
+        return cls.examples[oliveFile]
+
+    @classmethod
+    def Diff(cls, oliveFile: str, passes: Any) -> Any:
+        examplePasses, exampleHash = cls.GetExample(oliveFile)
+        passesHash = canonicalHash(passes)
+        if passesHash == exampleHash:
+            # same structure, nothing for DeepDiff to find
+            return {}
+        key = (oliveFile, passesHash)
+        if key not in cls.diffs:
+            cls.diffs[key] = filterOliveDiff(DeepDiff(examplePasses, passes))
+        return cls.diffs[key]
+
+
+def filterOliveDiff(diff: DeepDiff) -> DeepDiff:
+    addeds: list[str] = diff.pop("dictionary_item_added", [])
+    newAddeds = []
+    for added in addeds:
+        if added.endswith("['save_as_external_data']"):
+            # We add it to align model format
+            pass
+        else:
+            newAddeds.append(added)
+    if newAddeds:
+        diff["dictionary_item_added"] = newAddeds
+
+    removeds: list[str] = diff.pop("dictionary_item_removed", [])
+    newRemoveds = []
+    for removed in removeds:
+        if removed.endswith("['reuse_cache']"):
+            # In debug mode for olive, this will throw exception 'file is occupied' for ov recipes
+            pass
+        else:
+            newRemoveds.append(removed)
+    if newRemoveds:
+        diff["dictionary_item_removed"] = newRemoveds
+
+    changeds: dict[str, Any] = diff.pop("values_changed", {})
+    newChangeds = {}
+    for changed in changeds:
+        if changed.endswith("['data_config']") or changed.endswith("['user_script']"):
+            # Data config name or *.py could be different
+            pass
+        else:
+            newChangeds[changed] = changeds[changed]
+    if newChangeds:
+        diff["values_changed"] = newChangeds
+    return diff
+
+
 class ModelParameter(BaseModelClass):
     name: str
     oliveFile: Optional[str] = None
@@ -215,14 +291,9 @@ class ModelParameter(BaseModelClass):
     sections: List[Section]
 
     @staticmethod
+    @timeStage("model parameter")
     def Read(parameterFile: str):
-        printProcess(parameterFile)
-        with open_ex(parameterFile, "r") as file:
-            parameterContent = file.read()
-        modelParameter = ModelParameter.model_validate_json(parameterContent, strict=True)
-        modelParameter._file = parameterFile
-        modelParameter._fileContent = parameterContent
-        return modelParameter
+        return ModelParameter.ReadFile(parameterFile)
 
     def getIntelDevices(self) -> Iterator[OliveDeviceTypes]:
         for tmpDevice in OliveDeviceTypes:
@@ -232,8 +303,9 @@ class ModelParameter(BaseModelClass):
                 continue
             yield tmpDevice
 
+    @timeStage("model parameter")
     def Check(self, templates: Dict[str, Parameter], oliveJson: Any, modelList: ModelList):
-        GlobalVars.configCheck.append(self._file)
+        GlobalVars.AddCheckItem("configCheck", self._file)
 
         if not self.sections:
             printError(f"{self._file} should have sections")
@@ -547,51 +619,11 @@ class ModelParameter(BaseModelClass):
             printWarning(f"{self._file} does not have oliveFile")
             return
 
-        with open_ex(os.path.join(GlobalVars.olivePath, "examples", self.oliveFile), "r") as file:
-            oliveFileJson = json.load(file)
-
-        diff = DeepDiff(
-            oliveFileJson[OlivePropertyNames.Passes],
-            oliveJson[OlivePropertyNames.Passes],
-        )
-
-        addeds: list[str] = diff.pop("dictionary_item_added", [])
-        newAddeds = []
-        for added in addeds:
-            if added.endswith("['save_as_external_data']"):
-                # We add it to align model format
-                pass
-            else:
-                newAddeds.append(added)
-        if newAddeds:
-            diff["dictionary_item_added"] = newAddeds
-
-        removeds: list[str] = diff.pop("dictionary_item_removed", [])
-        newRemoveds = []
-        for removed in removeds:
-            if removed.endswith("['reuse_cache']"):
-                # In debug mode for olive, this will throw exception 'file is occupied' for ov recipes
-                pass
-            else:
-                newRemoveds.append(removed)
-        if newRemoveds:
-            diff["dictionary_item_removed"] = newRemoveds
-
-        changeds: dict[str, Any] = diff.pop("values_changed", {})
-        newChangeds = {}
-        for changed in changeds:
-            if changed.endswith("['data_config']") or changed.endswith("['user_script']"):
-                # Data config name or *.py could be different
-                pass
-            else:
-                newChangeds[changed] = changeds[changed]
-        if newChangeds:
-            diff["values_changed"] = newChangeds
-
+        diff = OliveExamples.Diff(self.oliveFile, oliveJson[OlivePropertyNames.Passes])
         if diff:
             # Check out branch hualxie/example_align for alignments
             printError(f"different from {self.oliveFile}\r\n{diff}")
-        GlobalVars.oliveCheck += 1
+        GlobalVars.AddCount("oliveCheck")
 
     def checkDebugInfo(self, oliveJson: Any):
         self.debugInfo = DebugInfo()
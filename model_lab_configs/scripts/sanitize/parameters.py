@@ -6,7 +6,6 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional, Union
 
-import pydash
 from pydantic import BaseModel, TypeAdapter
 
 from .base import BaseModelClass
@@ -18,7 +17,7 @@ from .constants import (
     ParameterTypeEnum,
 )
 from .model_info import ModelList
-from .utils import checkPath, open_ex, printError, printProcess, printWarning
+from .utils import DocumentCache, checkPath, getJsonPath, printError, printProcess, printWarning
 
 
 class ParameterCheck(BaseModel):
@@ -199,7 +198,7 @@ class Parameter(BaseModel):
                     return False
                 # TODO more checks
                 if self.values:
-                    value = pydash.get(oliveJson, self.path)
+                    value = getJsonPath(oliveJson, self.path)
                     if self.tags and (
                         ParameterTagEnum.EvaluationDataset in self.tags
                         or ParameterTagEnum.QuantizationDataset in self.tags
@@ -254,8 +253,7 @@ class Parameter(BaseModel):
 
 def readCheckParameterTemplate(filePath: str):
     printProcess(filePath)
-    with open_ex(filePath, "r") as file:
-        fileContent = file.read()
+    fileContent = DocumentCache.ReadText(filePath)
     adapter = TypeAdapter(Dict[str, Parameter])
     parameters: Dict[str, Parameter] = adapter.validate_json(fileContent, strict=True)
     for key, parameter in parameters.items():
@@ -9,7 +9,7 @@ from pydantic import BaseModel
 from .base import BaseModelClass
 from .constants import IconEnum
 from .model_info import ModelInfo
-from .utils import GlobalVars, open_ex, printError, printProcess
+from .utils import GlobalVars, printError, timeStage
 
 
 class WorkflowItem(BaseModel):
@@ -54,18 +54,14 @@ class ModelProjectConfig(BaseModelClass):
     modelInfo: ModelInfoProject
 
     @staticmethod
+    @timeStage("model project config")
     def Read(modelSpaceConfigFile: str):
-        printProcess(modelSpaceConfigFile)
-        with open_ex(modelSpaceConfigFile, "r") as file:
-            modelSpaceConfigContent = file.read()
-        modelSpaceConfig = ModelProjectConfig.model_validate_json(modelSpaceConfigContent, strict=True)
-        modelSpaceConfig._file = modelSpaceConfigFile
-        modelSpaceConfig._fileContent = modelSpaceConfigContent
-        return modelSpaceConfig
+        return ModelProjectConfig.ReadFile(modelSpaceConfigFile)
 
     # after template is set
+    @timeStage("model project config")
     def Check(self, modelInfo: ModelInfo):
-        GlobalVars.modelProjectCheck.append(self._file)
+        GlobalVars.AddCheckItem("modelProjectCheck", self._file)
 
         for i, model in enumerate(self.workflows):
             if not model.Check():
@@ -0,0 +1,286 @@
+"""
+Generate a synthetic model_lab_configs tree to measure sanitize at scale
+
+python -m sanitize.synthetic_tree --output ../../synthetic --models 1000 --versions 1 --workflows 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import shutil
+from typing import Any
+
+from .constants import EPNames, ParameterTagEnum, PhaseTypeEnum
+
+datasetName = "imagenet"
+
+
+def writeFile(filePath: str, content: Any):
+    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+    with open(filePath, "w", encoding="utf-8", newline="\n") as file:
+        if isinstance(content, str):
+            file.write(content)
+        else:
+            json.dump(content, file, indent=4)
+            file.write("\n")
+
+
+def findTemplate(parameterTemplate: dict[str, Any], tag: ParameterTagEnum) -> str:
+    """
+    Use real template names so parameters are checked against parameter_template.json
+    """
+    return next(name for name, template in parameterTemplate.items() if tag.value in template.get("tags", []))
+
+
+def makeOliveJson(modelName: str, outputName: str, activationType: str) -> dict[str, Any]:
+    """
+    Shape of a QNN static quantization recipe
+    """
+    return {
+        "input_model": {"type": "HfModel", "model_path": modelName},
+        "systems": {
+            "target_system": {
+                "type": "LocalSystem",
+                "accelerators": [
+                    {"device": "npu", "execution_providers": [EPNames.QNNExecutionProvider.value]},
+                ],
+            }
+        },
+        "data_configs": [
+            {
+                "name": "quantize_data_config",
+                "type": "HuggingfaceContainer",
+                "load_dataset_config": {"data_name": datasetName, "split": "train"},
+                "pre_process_data_config": {"type": "image_classification_pre_process", "max_samples": 256},
+            },
+            {
+                "name": "evaluation_data_config",
+                "type": "HuggingfaceContainer",
+                "load_dataset_config": {"data_name": datasetName, "split": "validation"},
+                "pre_process_data_config": {"type": "image_classification_pre_process", "max_samples": 256},
+            },
+        ],
+        "evaluators": {
+            "common_evaluator": {
+                "metrics": [
+                    {
+                        "name": "accuracy",
+                        "type": "accuracy",
+                        "data_config": "evaluation_data_config",
+                        "sub_types": [{"name": "accuracy_score", "priority": 1}],
+                    },
+                    {
+                        "name": "latency",
+                        "type": "latency",
+                        "data_config": "evaluation_data_config",
+                        "sub_types": [{"name": "avg", "priority": 2}],
+                    },
+                ]
+            }
+        },
+        "passes": {
+            "conversion": {"type": "OnnxConversion", "target_opset": 17, "save_as_external_data": True},
+            "quantization": {
+                "type": "OnnxStaticQuantization",
+                "data_config": "quantize_data_config",
+                "activation_type": activationType,
+                "weight_type": "uint8",
+                "save_as_external_data": True,
+            },
+        },
+        "target": "target_system",
+        "evaluator": "common_evaluator",
+        "cache_dir": "cache",
+        "output_dir": f"model/{outputName}",
+        "evaluate_input_model": False,
+    }
+
+
+def makeModelParameter(name: str, oliveFile: str, parameterTemplate: dict[str, Any]) -> dict[str, Any]:
+    def parameter(path: str, tag: ParameterTagEnum, values: list[str] | None = None):
+        template: dict[str, Any] = {"path": path, "template": findTemplate(parameterTemplate, tag)}
+        if values:
+            template["values"] = values
+        return {"template": template}
+
+    return {
+        "name": name,
+        "oliveFile": oliveFile,
+        "runtime": {"name": "Runtime"},
+        "sections": [
+            {"name": "Convert", "phase": PhaseTypeEnum.Conversion.value, "parameters": []},
+            {
+                "name": "Quantize",
+                "phase": PhaseTypeEnum.Quantization.value,
+                "parameters": [
+                    parameter(
+                        "data_configs[0].load_dataset_config.data_name",
+                        ParameterTagEnum.QuantizationDataset,
+                        [datasetName],
+                    ),
+                    parameter("passes.quantization.activation_type", ParameterTagEnum.ActivationType),
+                    parameter("passes.quantization.weight_type", ParameterTagEnum.WeightType),
+                ],
+            },
+            {
+                "name": "Evaluate",
+                "phase": PhaseTypeEnum.Evaluation.value,
+                "parameters": [
+                    parameter(
+                        "data_configs[1].load_dataset_config.data_name",
+                        ParameterTagEnum.EvaluationDataset,
+                        [datasetName],
+                    ),
+                ],
+            },
+        ],
+    }
+
+
+def makeNotebook(outputKB: int) -> dict[str, Any]:
+    """
+    outputKB of base64 image output like a notebook saved after running it
+    """
+    outputs = []
+    if outputKB:
+        image = base64.b64encode(os.urandom(outputKB * 768)).decode()
+        outputs.append({"output_type": "display_data", "data": {"image/png": image}, "metadata": {}})
+    source = [
+        "import onnxruntime as ort\n",
+        'session = ort.InferenceSession("./model/model.onnx", providers=["CPUExecutionProvider"])\n',
+        f'ExecutionProvider="{EPNames.QNNExecutionProvider.value}"\n',
+    ]
+    return {
+        "cells": [{"cell_type": "code", "execution_count": None, "metadata": {}, "outputs": outputs, "source": source}],
+        "metadata": {},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def generate(
+    sourceDir: str,
+    outputDir: str,
+    models: int,
+    versions: int,
+    workflows: int,
+    brokenEvery: int,
+    notebookOutputKB: int = 0,
+    oliveDir: str | None = None,
+):
+    """
+    Create models x versions x workflows configs. When brokenEvery > 0, every brokenEvery-th model gets
+    an invalid activation type, a missing README.md and a missing .gitignore so error paths are measured too.
+    Note sanitize reports an error for models with more than one version.
+    With oliveDir, also create the upstream examples the workflows refer to, for checks with --olive.
+    """
+    shutil.rmtree(outputDir, ignore_errors=True)
+    os.makedirs(outputDir)
+    for name in ["parameter_template.json", "gitignore.md", ".gitignore"]:
+        shutil.copy(os.path.join(sourceDir, name), outputDir)
+    with open(os.path.join(sourceDir, "parameter_template.json"), "r", encoding="utf-8") as file:
+        parameterTemplate = json.load(file)
+    with open(os.path.join(sourceDir, "gitignore.md"), "r", encoding="utf-8") as file:
+        gitignoreContent = file.read()
+    notebook = makeNotebook(notebookOutputKB)
+    requirements = (
+        "# This file will be installed together with AITK runtime requirements\n"
+        "# For the full requirements, see AITK\n"
+        "onnx\n"
+    )
+
+    if oliveDir:
+        for k in range(workflows):
+            workflowName = f"model_qdq_{k}"
+            example = makeOliveJson("synthetic/model", workflowName, "uint16")
+            for olivePass in example["passes"].values():
+                # we add it to align model format, so only in our json
+                olivePass.pop("save_as_external_data")
+            writeFile(os.path.join(oliveDir, "examples", "synthetic", f"{workflowName}.json"), example)
+
+    modelInfos = []
+    for i in range(models):
+        broken = brokenEvery > 0 and i % brokenEvery == brokenEvery - 1
+        modelName = f"synthetic/model-{i}"
+        modelId = f"huggingface/{modelName}"
+        modelInfos.append(
+            {
+                "displayName": modelName,
+                "icon": "HuggingFace",
+                "modelLink": f"https://huggingface.co/{modelName}",
+                "id": modelId,
+                "runtimes": ["QNN"],
+                "architecture": "CNN",
+                "status": "Ready",
+                "version": versions,
+            }
+        )
+        for version in range(1, versions + 1):
+            modelVerDir = os.path.join(outputDir, modelId, str(version))
+            workflowItems = []
+            for k in range(workflows):
+                workflowName = f"model_qdq_{k}"
+                activationType = "int4" if broken else "uint16"
+                writeFile(
+                    os.path.join(modelVerDir, f"{workflowName}.json"),
+                    makeOliveJson(modelName, workflowName, activationType),
+                )
+                writeFile(
+                    os.path.join(modelVerDir, f"{workflowName}.json.config"),
+                    makeModelParameter(f"Convert to QNN {k}", f"synthetic/{workflowName}.json", parameterTemplate),
+                )
+                workflowItems.append({"file": f"{workflowName}.json", "templateName": workflowName})
+            writeFile(
+                os.path.join(modelVerDir, "model_project.config"),
+                {"workflows": workflowItems, "modelInfo": {"id": modelId, "version": version}},
+            )
+            writeFile(os.path.join(modelVerDir, "inference_sample.ipynb"), notebook)
+            writeFile(os.path.join(modelVerDir, "requirements.txt"), requirements)
+            if not broken:
+                writeFile(os.path.join(modelVerDir, "README.md"), f"# {modelName}\n")
+                writeFile(os.path.join(modelVerDir, ".gitignore"), gitignoreContent)
+
+    writeFile(
+        os.path.join(outputDir, "model_list.json"),
+        {
+            "models": modelInfos,
+            "template_models": [],
+            "HFDatasets": {datasetName: "timm/mini-imagenet"},
+            "LoginRequiredDatasets": [],
+            "LoginRequiredModelIds": [],
+            "DatasetSplit": {},
+            "DatasetSubset": {},
+        },
+    )
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Generate a synthetic model lab configs tree")
+    argparser.add_argument("--output", required=True, type=str, help="Folder to create, removed first if exists")
+    argparser.add_argument("--models", default=100, type=int, help="Number of models")
+    argparser.add_argument("--versions", default=1, type=int, help="Number of versions per model")
+    argparser.add_argument("--workflows", default=2, type=int, help="Number of workflows per version")
+    argparser.add_argument("--broken-every", default=0, type=int, help="Make every n-th model invalid, 0 for none")
+    argparser.add_argument("--notebook-output-kb", default=0, type=int, help="Size of image output in notebooks")
+    argparser.add_argument("--olive-output", default=None, type=str, help="Also create an olive repo with examples")
+    args = argparser.parse_args()
+
+    sourceDir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    generate(
+        sourceDir,
+        args.output,
+        args.models,
+        args.versions,
+        args.workflows,
+        args.broken_every,
+        args.notebook_output_kb,
+        args.olive_output,
+    )
+    print(f"Generated {args.models} models x {args.versions} versions x {args.workflows} workflows in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
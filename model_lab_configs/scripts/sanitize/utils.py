@@ -2,21 +2,36 @@
 Utility functions for the sanitize module
 """
 
-import inspect
+import difflib
+import hashlib
 import json
 import os
+import re
+import sys
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any
+from functools import lru_cache
+from typing import Any, List, Optional
 
 import pydash
 from model_lab import RuntimeEnum
+from pydantic import BaseModel
 
-from .constants import EPNames, OliveDeviceTypes, OlivePropertyNames
+from .constants import DiagnosticSeverityEnum, EPNames, OliveDeviceTypes, OlivePropertyNames
 
 
 class GlobalVars:
+    # Diagnostic list, errors are printed in the end
     errorList = []
     verbose = False
+    # Diagnostics below this severity are not reported
+    minSeverity = DiagnosticSeverityEnum.Tip
+    # text prints warnings and tips when they happen, json and sarif collect them in diagnostics to write in the end
+    diagnosticFormat = "text"
+    diagnostics = []
+    # Seconds spent in each stage, reported with --timing
+    stageTimes: dict[str, float] = {}
     # Initialize checks
     pathCheck = 0
     configCheck = []
@@ -76,16 +91,24 @@ class GlobalVars:
                 f"Gitignore check {len(cls.gitignoreCheck)} does not match model project check {len(cls.modelProjectCheck)} - {cls.extensionCheck}"
             )
         # We add this test to make sure the sanity check is working: i.e. paths are checked and files are checked
-        with open_ex(os.path.join(configDir, "checks.json"), "w") as file:
-            # get class properties and dump all ends with Check
-            properties = [attr for attr in dir(cls) if attr.endswith("Check") and attr != "Check"]
-            # save len if list else save the value
-            properties = {
-                prop: len(getattr(cls, prop)) if isinstance(getattr(cls, prop), list) else getattr(cls, prop)
-                for prop in properties
-            }
-            json.dump(properties, file, indent=4)
-            file.write("\n")
+        # get class properties and dump all ends with Check
+        properties = [attr for attr in dir(cls) if attr.endswith("Check") and attr != "Check"]
+        # save len if list else save the value
+        properties = {
+            prop: len(getattr(cls, prop)) if isinstance(getattr(cls, prop), list) else getattr(cls, prop)
+            for prop in properties
+        }
+        DocumentCache.Write(os.path.join(configDir, "checks.json"), json.dumps(properties, indent=4) + "\n")
+
+    @classmethod
+    def AddCheckItem(cls, name: str, value: Any):
+        if not _recordTask("check", name, value):
+            getattr(cls, name).append(value)
+
+    @classmethod
+    def AddCount(cls, name: str, count: int = 1):
+        if not _recordTask("count", name, count):
+            setattr(cls, name, getattr(cls, name) + count)
 
     @classmethod
     def GetRuntimeRPC(cls, epName: EPNames, oliveDeviceType: OliveDeviceTypes) -> RuntimeEnum:
@@ -108,54 +131,210 @@ class GlobalVars:
         raise ValueError(f"No matching runtime found for EPName: {epName} and OliveDeviceType: {oliveDeviceType}")
 
 
+class TaskOutput(BaseModel):
+    """
+    Everything a task would print or add to GlobalVars, recorded in order.
+    Tasks running in parallel are applied one after another so the result matches a serial run.
+    """
+
+    records: List[List[Any]] = []
+
+    def apply(self):
+        for kind, *values in self.records:
+            if kind == "print":
+                print(values[0])
+            elif kind == "diagnostic":
+                addDiagnostic(Diagnostic(severity=values[0], filename=values[1], lineno=values[2], msg=values[3]))
+            elif kind == "check":
+                GlobalVars.AddCheckItem(values[0], values[1])
+            elif kind == "count":
+                GlobalVars.AddCount(values[0], values[1])
+            elif kind == "write":
+                DocumentCache.Write(values[0], values[1])
+
+    def hasWrites(self) -> bool:
+        return any(record[0] == "write" for record in self.records)
+
+
+_taskState = threading.local()
+
+
+@contextmanager
+def recordTask():
+    output = TaskOutput()
+    _taskState.output = output
+    try:
+        yield output
+    finally:
+        _taskState.output = None
+
+
+def _recordTask(*record: Any) -> bool:
+    output = getattr(_taskState, "output", None)
+    if output is None:
+        return False
+    output.records.append(list(record))
+    return True
+
+
+@contextmanager
+def timeStage(name: str):
+    """
+    Add time spent in the block to GlobalVars.stageTimes. Could also be used as a function decorator
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        GlobalVars.stageTimes[name] = GlobalVars.stageTimes.get(name, 0.0) + time.perf_counter() - start
+
+
+def _print(text: str):
+    if not _recordTask("print", text):
+        print(text)
+
+
 def printProcess(msg: str):
     if GlobalVars.verbose:
-        print(f"Process {msg}")
+        _print(f"Process {msg}")
 
 
 def printInfo(msg: str):
     if GlobalVars.verbose:
-        print(msg)
+        _print(msg)
+
+
+severityOrder = [DiagnosticSeverityEnum.Error, DiagnosticSeverityEnum.Warning, DiagnosticSeverityEnum.Tip]
+severityFormats = {
+    # Red, yellow and cyan text, with file and line number, clickable in terminal
+    DiagnosticSeverityEnum.Error: "\033[31mERROR: {location}: {msg}\033[0m",
+    DiagnosticSeverityEnum.Warning: "\033[33mWARNING: {location}: {msg}\033[0m",
+    DiagnosticSeverityEnum.Tip: "\033[36mTip: {location}: {msg}\033[0m",
+}
+
+
+@lru_cache(maxsize=None)
+def getRelativePath(filename: str) -> str:
+    return os.path.relpath(filename)
+
+
+class Diagnostic(BaseModel):
+    severity: DiagnosticSeverityEnum
+    msg: str
+    # Caller code file and line. Only resolved to a relative path when reported
+    filename: str
+    lineno: int
+
+    @property
+    def location(self) -> str:
+        if self.filename == "unknown":
+            return self.filename
+        return getRelativePath(self.filename)
+
+    def format(self) -> str:
+        return severityFormats[self.severity].format(location=f"{self.location}:{self.lineno}", msg=self.msg)
+
+
+def shouldReport(severity: DiagnosticSeverityEnum) -> bool:
+    return severityOrder.index(severity) <= severityOrder.index(GlobalVars.minSeverity)
+
+
+def addDiagnostic(diagnostic: Diagnostic):
+    if _recordTask("diagnostic", diagnostic.severity.value, diagnostic.filename, diagnostic.lineno, diagnostic.msg):
+        return
+    if diagnostic.severity == DiagnosticSeverityEnum.Error:
+        # print all errors in the end
+        GlobalVars.errorList.append(diagnostic)
+    elif not shouldReport(diagnostic.severity):
+        return
+    elif GlobalVars.diagnosticFormat == "text":
+        print(diagnostic.format())
+    else:
+        GlobalVars.diagnostics.append(diagnostic)
+
+
+def _addCallerDiagnostic(severity: DiagnosticSeverityEnum, msg: str):
+    try:
+        # 0 is this function, 1 is printError etc., 2 is their caller
+        frame = sys._getframe(2)
+        filename, lineno = frame.f_code.co_filename, frame.f_lineno
+    except ValueError:
+        filename, lineno = "unknown", 0
+    addDiagnostic(Diagnostic(severity=severity, msg=msg, filename=filename, lineno=lineno))
 
 
 def printTip(msg: str):
     """Print important information with special color formatting (cyan)"""
-    frame = inspect.currentframe()
-    if frame and frame.f_back:
-        frame = frame.f_back
-        filename = os.path.relpath(frame.f_code.co_filename)
-        lineno = frame.f_lineno
-    else:
-        filename = "unknown"
-        lineno = 0
-    # Cyan text with file and line number, clickable in terminal
-    print(f"\033[36mTip: {filename}:{lineno}: {msg}\033[0m")
+    _addCallerDiagnostic(DiagnosticSeverityEnum.Tip, msg)
 
 
 def printError(msg: str):
-    frame = inspect.currentframe()
-    if frame and frame.f_back:
-        frame = frame.f_back
-        filename = os.path.relpath(frame.f_code.co_filename)
-        lineno = frame.f_lineno
-    else:
-        filename = "unknown"
-        lineno = 0
-    # print all errors in the end
-    GlobalVars.errorList.append((filename, lineno, msg))
+    _addCallerDiagnostic(DiagnosticSeverityEnum.Error, msg)
 
 
 def printWarning(msg: str):
-    frame = inspect.currentframe()
-    if frame and frame.f_back:
-        frame = frame.f_back
-        filename = os.path.relpath(frame.f_code.co_filename)
-        lineno = frame.f_lineno
+    _addCallerDiagnostic(DiagnosticSeverityEnum.Warning, msg)
+
+
+def reportDiagnostics(outputFile: str | None = None):
+    """
+    Print errors for text format, or write all reported diagnostics as json or sarif to outputFile or stdout
+    """
+    errors = [diagnostic for diagnostic in GlobalVars.errorList if shouldReport(diagnostic.severity)]
+    if GlobalVars.diagnosticFormat == "text":
+        for diagnostic in errors:
+            print(diagnostic.format())
+        return
+
+    diagnostics = GlobalVars.diagnostics + errors
+    if GlobalVars.diagnosticFormat == "json":
+        result = {
+            "diagnostics": [
+                {
+                    "severity": diagnostic.severity.value,
+                    "message": diagnostic.msg,
+                    "file": diagnostic.location,
+                    "line": diagnostic.lineno,
+                }
+                for diagnostic in diagnostics
+            ]
+        }
     else:
-        filename = "unknown"
-        lineno = 0
-    # Yellow text, with file and line number, clickable in terminal
-    print(f"\033[33mWARNING: {filename}:{lineno}: {msg}\033[0m")
+        sarifLevels = {
+            DiagnosticSeverityEnum.Error: "error",
+            DiagnosticSeverityEnum.Warning: "warning",
+            DiagnosticSeverityEnum.Tip: "note",
+        }
+        result = {
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "version": "2.1.0",
+            "runs": [
+                {
+                    "tool": {"driver": {"name": "sanitize"}},
+                    "results": [
+                        {
+                            "level": sarifLevels[diagnostic.severity],
+                            "message": {"text": diagnostic.msg},
+                            "locations": [
+                                {
+                                    "physicalLocation": {
+                                        "artifactLocation": {"uri": diagnostic.location.replace("\\", "/")},
+                                        "region": {"startLine": max(diagnostic.lineno, 1)},
+                                    }
+                                }
+                            ],
+                        }
+                        for diagnostic in diagnostics
+                    ],
+                }
+            ],
+        }
+    if outputFile:
+        with open_ex(outputFile, "w") as file:
+            json.dump(result, file, indent=4)
+            file.write("\n")
+    else:
+        print(json.dumps(result, indent=4))
 
 
 @contextmanager
@@ -168,16 +347,191 @@ def open_ex(file_path, mode):
         file.close()
 
 
+class JournalEntry(BaseModel):
+    """
+    A file changed by Flush, with sha256 of its bytes before and after. before is None for new files
+    """
+
+    path: str
+    before: Optional[str] = None
+    after: str
+
+
+class DocumentCache:
+    """
+    Per run cache of file contents keyed by path and mtime, and of json parsed from them.
+    Writes are kept in memory so later reads see them, and written to disk once by Flush.
+    Parsed json objects are shared, so write the file after changing one.
+    """
+
+    # print a unified diff in Flush instead of writing
+    dryRun = False
+    # every file changed by Flush in this run
+    journal: List[JournalEntry] = []
+
+    # path: (mtime, content)
+    documents: dict[str, tuple[int, str]] = {}
+    # path: (content, parsed json)
+    parsed: dict[str, tuple[str, Any]] = {}
+    # path: content to write
+    pending: dict[str, str] = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def ReadText(cls, filePath: str, keep: bool = True) -> str:
+        """
+        Use keep=False for large files read only once, like notebooks with outputs
+        """
+        with cls.lock:
+            if filePath in cls.pending:
+                return cls.pending[filePath]
+            mtime = os.stat(filePath).st_mtime_ns
+            cached = cls.documents.get(filePath)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open_ex(filePath, "r") as file:
+            content = file.read()
+        if keep:
+            with cls.lock:
+                cls.documents[filePath] = (mtime, content)
+        return content
+
+    @classmethod
+    def ReadJson(cls, filePath: str) -> Any:
+        content = cls.ReadText(filePath)
+        cached = cls.parsed.get(filePath)
+        if cached and cached[0] is content:
+            return cached[1]
+        value = json.loads(content)
+        with cls.lock:
+            cls.parsed[filePath] = (content, value)
+        return value
+
+    @classmethod
+    def Exists(cls, filePath: str) -> bool:
+        return filePath in cls.pending or os.path.exists(filePath)
+
+    @classmethod
+    def Write(cls, filePath: str, content: str):
+        if cls.Exists(filePath) and cls.ReadText(filePath) == content:
+            return
+        # record for the main process, and keep it pending so later reads in the task see it
+        _recordTask("write", filePath, content)
+        with cls.lock:
+            cls.pending[filePath] = content
+
+    @classmethod
+    def Copy(cls, src: str, dst: str):
+        cls.Write(dst, cls.ReadText(src))
+
+    @classmethod
+    def DiscardPending(cls):
+        with cls.lock:
+            cls.pending.clear()
+
+    @classmethod
+    def Flush(cls, root: str | None = None) -> List[str]:
+        """
+        Write all pending files whose bytes changed and add them to the journal. Returns paths written.
+        In dry run, print their diff with paths relative to root instead.
+        """
+        with cls.lock:
+            pending = sorted(cls.pending.items())
+            cls.pending.clear()
+        written = []
+        for filePath, content in pending:
+            newBytes = content.encode("utf-8")
+            oldBytes = None
+            if os.path.exists(filePath):
+                with open(filePath, "rb") as file:
+                    oldBytes = file.read()
+            if oldBytes != newBytes:
+                cls.journal.append(
+                    JournalEntry(
+                        path=filePath,
+                        before=hashlib.sha256(oldBytes).hexdigest() if oldBytes is not None else None,
+                        after=hashlib.sha256(newBytes).hexdigest(),
+                    )
+                )
+                if cls.dryRun:
+                    oldText = oldBytes.decode("utf-8") if oldBytes is not None else ""
+                    print(formatDiff(os.path.relpath(filePath, root) if root else filePath, oldText, content), end="")
+                    continue
+                with open_ex(filePath, "w") as file:
+                    file.write(content)
+                written.append(filePath)
+            with cls.lock:
+                cls.documents[filePath] = (os.stat(filePath).st_mtime_ns, content)
+        return written
+
+
+def formatDiff(filePath: str, oldText: str, newText: str) -> str:
+    filePath = filePath.replace("\\", "/")
+    lines = difflib.unified_diff(
+        oldText.splitlines(keepends=True),
+        newText.splitlines(keepends=True),
+        fromfile=f"a/{filePath}",
+        tofile=f"b/{filePath}",
+    )
+    # like git, mark a last line without newline
+    return "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in lines)
+
+
 def get_target_system(oliveJson: Any):
     syskey = oliveJson[OlivePropertyNames.Target]
     sysValue = oliveJson[OlivePropertyNames.Systems][syskey]
     return syskey, sysValue
 
 
+@lru_cache(maxsize=None)
+def parsePath(path: str) -> tuple[str, ...]:
+    """
+    Split a path like data_configs[0].load_dataset_config.data_name into ("data_configs", "0", "load_dataset_config", "data_name")
+    """
+    return tuple(token for token in re.split(r"[.\[\]]+", path) if token)
+
+
+class OliveJson(dict):
+    """
+    Olive json with an index of all paths to their values, built on first lookup.
+    Should not be modified after that, so readCheckOliveConfig returns it after all updates.
+    """
+
+    _index: dict[tuple[str, ...], Any] | None = None
+
+    def getPath(self, path: str) -> Any:
+        if self._index is None:
+            self._index = {}
+            stack: list[tuple[tuple[str, ...], Any]] = [((), self)]
+            while stack:
+                prefix, value = stack.pop()
+                if isinstance(value, dict):
+                    items = value.items()
+                elif isinstance(value, list):
+                    items = enumerate(value)
+                else:
+                    continue
+                for key, child in items:
+                    childPrefix = prefix + (str(key),)
+                    self._index[childPrefix] = child
+                    stack.append((childPrefix, child))
+        key = parsePath(path)
+        if key in self._index:
+            return self._index[key]
+        # keys with . or [ and other rare syntax
+        return pydash.get(self, path)
+
+
+def getJsonPath(oliveJson: Any, path: str) -> Any:
+    if isinstance(oliveJson, OliveJson):
+        return oliveJson.getPath(path)
+    return pydash.get(oliveJson, path)
+
+
 def checkPath(path: str, oliveJson: Any, printOnNotExist: bool = True):
     printInfo(path)
-    GlobalVars.pathCheck += 1
-    if pydash.get(oliveJson, path) is None:
+    GlobalVars.AddCount("pathCheck")
+    if getJsonPath(oliveJson, path) is None:
         syskey, system = get_target_system(oliveJson)
         currentEp = system[OlivePropertyNames.Accelerators][0][OlivePropertyNames.ExecutionProviders][0]
         # TODO some ov recipes do not have device but we set it in config
@@ -0,0 +1,125 @@
+"""
+File change notifications for watch mode, using watchdog if installed or polling otherwise
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import queue
+import threading
+from typing import Dict, List, Set
+
+try:
+    Observer = importlib.import_module("watchdog.observers").Observer
+except ImportError:
+    # poll instead
+    Observer = None
+
+
+class _EventHandler:
+    """
+    Handler for watchdog observers, which only call dispatch
+    """
+
+    def __init__(self, changes: queue.Queue[str]):
+        self.changes = changes
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        self.changes.put(os.path.abspath(event.src_path))
+        destPath = getattr(event, "dest_path", None)
+        if destPath:
+            self.changes.put(os.path.abspath(destPath))
+
+
+class ChangeWatcher:
+    """
+    Collect paths of changed files under the watched folders.
+    Files written by sanitize itself are ignored by Ignore, so fixing a file does not check it again.
+    """
+
+    def __init__(self, configDir: str, folders: List[str], interval: float = 0.3):
+        self.configDir = configDir
+        self.folders = folders
+        self.interval = interval
+        self.changes: queue.Queue[str] = queue.Queue()
+        # path: mtime written by sanitize
+        self.ignored: Dict[str, int] = {}
+        self.observer = None
+        self.stopEvent = threading.Event()
+
+    @property
+    def usePolling(self) -> bool:
+        return Observer is None
+
+    def Start(self):
+        if Observer is not None:
+            self.observer = Observer()
+            # a watch for each model folder would hit the inotify limit on big trees
+            self.observer.schedule(_EventHandler(self.changes), self.configDir, recursive=True)
+            self.observer.start()
+        else:
+            # scan before returning, so changes right after Start are not taken as the initial state
+            thread = threading.Thread(target=self._poll, args=(self._scan(),), daemon=True)
+            thread.start()
+
+    def Stop(self):
+        self.stopEvent.set()
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+
+    def Ignore(self, filePaths: List[str]):
+        for filePath in filePaths:
+            filePath = os.path.abspath(filePath)
+            if os.path.exists(filePath):
+                self.ignored[filePath] = os.stat(filePath).st_mtime_ns
+
+    def Wait(self, debounce: float = 0.05) -> Set[str]:
+        """
+        Block until files change. Editors often save in several steps, so wait a little more for the rest of them
+        """
+        paths = set()
+        while not paths:
+            paths.add(self.changes.get())
+            while True:
+                try:
+                    paths.add(self.changes.get(timeout=debounce))
+                except queue.Empty:
+                    break
+            paths = {path for path in paths if not self._isIgnored(path)}
+        return paths
+
+    def _isIgnored(self, filePath: str) -> bool:
+        mtime = self.ignored.get(filePath)
+        if mtime is None:
+            return False
+        if os.path.exists(filePath) and os.stat(filePath).st_mtime_ns == mtime:
+            return True
+        del self.ignored[filePath]
+        return False
+
+    def _scan(self) -> Dict[str, int]:
+        mtimes = {}
+        for folder in self.folders:
+            if os.path.isfile(folder):
+                mtimes[folder] = os.stat(folder).st_mtime_ns
+                continue
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    filePath = os.path.join(root, name)
+                    try:
+                        mtimes[filePath] = os.stat(filePath).st_mtime_ns
+                    except FileNotFoundError:
+                        pass
+        return mtimes
+
+    def _poll(self, snapshot: Dict[str, int]):
+        while not self.stopEvent.wait(self.interval):
+            current = self._scan()
+            for filePath in current.keys() | snapshot.keys():
+                if current.get(filePath) != snapshot.get(filePath):
+                    self.changes.put(os.path.abspath(filePath))
+            snapshot = current
@@ -0,0 +1,111 @@
+"""
+Watch mode keeps running and reports errors when a config is saved with invalid json
+
+python -m unittest discover tests
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from sanitize.synthetic_tree import generate
+
+scriptsDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sourceDir = os.path.dirname(scriptsDir)
+
+
+class WatchProcess:
+    def __init__(self, configDir: str):
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "sanitize.main", "--config-dir", configDir, "--watch"],
+            cwd=scriptsDir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+        )
+        self.lines: queue.Queue[str] = queue.Queue()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.put(line)
+
+    def waitFor(self, text: str, timeout: float = 30) -> list[str]:
+        """
+        Lines printed until one containing text
+        """
+        lines = []
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                raise AssertionError(f"{text!r} not printed, got {lines}") from None
+            lines.append(line)
+            if text in line:
+                return lines
+
+    def stop(self):
+        self.process.kill()
+        self.process.wait()
+        # the reader stops at the end of the output, then the pipe can be closed
+        self.reader.join()
+        self.process.stdout.close()
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.TemporaryDirectory()
+        self.configDir = os.path.join(self.tempDir.name, "model_lab_configs")
+        generate(sourceDir, self.configDir, models=2, versions=1, workflows=1, brokenEvery=0)
+        self.watch = WatchProcess(self.configDir)
+        self.watch.waitFor("Watching")
+
+    def tearDown(self):
+        self.watch.stop()
+        self.tempDir.cleanup()
+
+    def saveAndWait(self, filePath: str, content: str) -> list[str]:
+        with open(filePath, "w", encoding="utf-8") as file:
+            file.write(content)
+        lines = self.watch.waitFor("Checked ")
+        self.assertIsNone(self.watch.process.poll(), "watch process exited")
+        return [line for line in lines if "Failed to check" in line]
+
+    def test_invalid_model_config(self):
+        configFile = os.path.join(self.configDir, "huggingface", "synthetic", "model-1", "1", "model_qdq_0.json.config")
+        with open(configFile, "r", encoding="utf-8") as file:
+            goodConfig = file.read()
+
+        errors = self.saveAndWait(configFile, '{\n  "type": "Pass",\n  bad\n')
+        self.assertEqual(len(errors), 1)
+        self.assertIn("model_qdq_0.json.config", errors[0])
+
+        self.assertEqual(self.saveAndWait(configFile, goodConfig), [])
+
+    def test_invalid_model_list(self):
+        modelListFile = os.path.join(self.configDir, "model_list.json")
+        with open(modelListFile, "r", encoding="utf-8") as file:
+            goodModelList = file.read()
+
+        with open(modelListFile, "w", encoding="utf-8") as file:
+            file.write("{\n")
+        lines = self.watch.waitFor("Failed to check")
+        self.assertIn("model_list.json", lines[-1])
+        time.sleep(0.5)
+        self.assertIsNone(self.watch.process.poll(), "watch process exited")
+
+        self.assertEqual(self.saveAndWait(modelListFile, goodModelList), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
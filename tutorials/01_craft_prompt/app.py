@@ -3,20 +3,25 @@
 > pip install azure-ai-inference
 """
 import os
+from functools import lru_cache
 from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import AssistantMessage, SystemMessage, UserMessage
 from azure.ai.inference.models import ImageContentItem, ImageUrl, TextContentItem
 from azure.core.credentials import AzureKeyCredential
 
-def chat(user_query):
+@lru_cache(maxsize=None)
+def get_client(endpoint):
     # To authenticate with the model you will need to generate a personal access token (PAT) in your GitHub settings.
-  # Create your PAT token by following instructions here: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens
-    client = ChatCompletionsClient(
-        endpoint = "https://models.inference.ai.azure.com",
+    # Create your PAT token by following instructions here: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens
+    return ChatCompletionsClient(
+        endpoint = endpoint,
         credential = AzureKeyCredential(os.environ["GITHUB_TOKEN"]),
         api_version = "2024-08-01-preview",
     )
 
+def chat(user_query):
+    client = get_client("https://models.inference.ai.azure.com")
+
     response = client.complete(
         messages = [
             SystemMessage(content = "Generate one educational question for students"),
@@ -0,0 +1,117 @@
+"""Measure how soon the fields of a structured output response can be shown, with and without streaming
+
+> pip install azure-ai-inference
+> python benchmark_stream.py --calls 5 --token-delay 0.02 --trailing-tokens 200
+
+Runs against the local stub in stream_stub.py, so no model provider or API key is needed. Compares waiting
+for the whole response, streaming it to the end, and streaming with stream_fields, which stops reading once
+the schema is satisfied. Tokens are counted by the stub, including the ones generated after a client
+stopped reading.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from azure.ai.inference import ChatCompletionsClient
+from azure.ai.inference.models import JsonSchemaFormat, UserMessage
+from azure.core.credentials import AzureKeyCredential
+
+from json_stream import IncrementalJsonParser, stream_fields
+from stream_stub import serve
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def call_full(client, request, schema):
+    """
+    Seconds until the first and the last field can be shown, when the whole response is waited for.
+    """
+    start = time.perf_counter()
+    response = client.complete(**request)
+    json.loads(response.choices[0].message.content)
+    seconds = time.perf_counter() - start
+    return seconds, seconds
+
+
+def call_stream_to_end(client, request, schema):
+    start = time.perf_counter()
+    first = last = None
+    parser = IncrementalJsonParser()
+    response = client.complete(stream=True, **request)
+    for update in response:
+        if update.choices:
+            for path, _ in parser.feed(update.choices[0].delta.content or ""):
+                if len(path) == 1:
+                    last = time.perf_counter() - start
+                    first = first or last
+    response.close()
+    return first, last
+
+
+def call_stream_fields(client, request, schema):
+    start = time.perf_counter()
+    first = last = None
+    for path, _ in stream_fields(client.complete(stream=True, **request), schema):
+        if len(path) == 1:
+            last = time.perf_counter() - start
+            first = first or last
+    return first, last
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming structured output against a local stub.")
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the stub's first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds the stub takes per token")
+    parser.add_argument("--trailing-tokens", type=int, default=0, help="Whitespace tokens the stub adds after the JSON")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args()
+
+    with open(os.path.join(HERE, "response_schema_openai.json"), "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    request = {
+        "messages": [UserMessage(content="Newton's laws of motion")],
+        "model": "gpt-4o",
+        "response_format": JsonSchemaFormat(name=schema["name"], schema=schema["schema"], strict=schema["strict"]),
+        "max_tokens": 4096,
+    }
+
+    server = serve(args.port, args.first_token_delay, args.token_delay, args.trailing_tokens)
+    state = server.RequestHandlerClass.state
+    client = ChatCompletionsClient(
+        endpoint=f"http://127.0.0.1:{args.port}",
+        credential=AzureKeyCredential("stub"),
+        api_version="2024-08-01-preview",
+    )
+    try:
+        for name, call in (
+            ("full response", call_full),
+            ("stream to the end", call_stream_to_end),
+            ("stream_fields", call_stream_fields),
+        ):
+            firsts, lasts, totals, tokens = [], [], [], []
+            for _ in range(args.calls):
+                generated = state.tokens
+                start = time.perf_counter()
+                first, last = call(client, request, schema["schema"])
+                totals.append(time.perf_counter() - start)
+                # the stub notices a closed stream on its next token
+                time.sleep(args.token_delay * 3)
+                firsts.append(first)
+                lasts.append(last)
+                tokens.append(state.tokens - generated)
+            print(
+                f"{name:>17}: first field {statistics.mean(firsts) * 1000:.0f} ms,"
+                f" all fields {statistics.mean(lasts) * 1000:.0f} ms, call {statistics.mean(totals) * 1000:.0f} ms,"
+                f" {statistics.mean(tokens):.0f} tokens generated"
+            )
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
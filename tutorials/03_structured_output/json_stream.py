@@ -0,0 +1,172 @@
+"""Read a streamed structured output response one field at a time
+
+> python final_app.py --stream
+
+The response of a JSON schema response format only gets useful once it is valid JSON, which is at the last
+token. IncrementalJsonParser takes the text as it streams in and returns every value as soon as it is
+complete, like `topic` or `hints[0]`, so they can be shown while the rest is still generated.
+"""
+
+import json
+import re
+
+# string characters up to the next quote or escape
+STRING_END = re.compile(r'["\\]')
+LITERAL_END = re.compile(r"[\s,\]}]")
+
+VALUE, KEY, COLON, AFTER, STRING, KEY_STRING, LITERAL = range(7)
+
+
+class IncrementalJsonParser:
+    """
+    feed() text as it arrives and get back (path, value) for each value completed by it, where path is the
+    tuple of keys and indexes from the root, like ("hints", 0). Objects and arrays are returned when they
+    close, after their members. done is set once the whole document is complete.
+    """
+
+    def __init__(self):
+        # open objects and arrays, and the key or index of the member being parsed in each
+        self.stack = []
+        self.path = []
+        self.state = VALUE
+        self.token = []
+        # a backslash ended the last text, so the next character is escaped
+        self.escaped = False
+        self.value = None
+        self.done = False
+
+    def feed(self, text):
+        events = []
+        i = 0
+        while i < len(text):
+            if self.state in (STRING, KEY_STRING):
+                if self.escaped:
+                    self.token.append(text[i])
+                    self.escaped = False
+                    i += 1
+                    continue
+                match = STRING_END.search(text, i)
+                if not match:
+                    self.token.append(text[i:])
+                    break
+                end = match.start()
+                if text[end] == "\\":
+                    # keep escapes as they are for json.loads, the escaped character may be in the next text
+                    if end + 1 == len(text):
+                        self.token.append(text[i:])
+                        self.escaped = True
+                        break
+                    self.token.append(text[i : end + 2])
+                    i = end + 2
+                    continue
+                self.token.append(text[i:end])
+                i = end + 1
+                string = json.loads('"' + "".join(self.token) + '"')
+                self.token = []
+                if self.state == KEY_STRING:
+                    self.path[-1] = string
+                    self.state = COLON
+                else:
+                    self.complete(string, events)
+                continue
+
+            if self.state == LITERAL:
+                match = LITERAL_END.search(text, i)
+                if not match:
+                    self.token.append(text[i:])
+                    break
+                self.token.append(text[i : match.start()])
+                i = match.start()
+                self.complete(json.loads("".join(self.token)), events)
+                self.token = []
+
+            char = text[i]
+            i += 1
+            if char.isspace():
+                continue
+            if self.done:
+                raise ValueError(f"Unexpected {char!r} after the end of the document")
+            if self.state == VALUE:
+                if char == "{":
+                    self.open({}, None)
+                    self.state = KEY
+                elif char == "[":
+                    self.open([], 0)
+                    self.state = VALUE
+                elif char == "]" and self.stack and self.stack[-1] == []:
+                    self.close(events)
+                elif char == '"':
+                    self.state = STRING
+                elif char in "-0123456789tfn":
+                    self.token = [char]
+                    self.state = LITERAL
+                else:
+                    raise ValueError(f"Unexpected {char!r} in JSON")
+            elif self.state == KEY and char == '"':
+                self.state = KEY_STRING
+            elif self.state == KEY and char == "}" and self.stack[-1] == {}:
+                self.close(events)
+            elif self.state == COLON and char == ":":
+                self.state = VALUE
+            elif self.state == AFTER and char == ",":
+                self.state = KEY if isinstance(self.stack[-1], dict) else VALUE
+            elif self.state == AFTER and char == ("}" if isinstance(self.stack[-1], dict) else "]"):
+                self.close(events)
+            else:
+                raise ValueError(f"Unexpected {char!r} in JSON")
+        return events
+
+    def open(self, container, key):
+        self.stack.append(container)
+        self.path.append(key)
+
+    def close(self, events):
+        self.path.pop()
+        self.complete(self.stack.pop(), events)
+
+    def complete(self, value, events):
+        if not self.stack:
+            self.value = value
+            self.done = True
+            self.state = AFTER
+            events.append(((), value))
+            return
+        parent = self.stack[-1]
+        events.append((tuple(self.path), value))
+        if isinstance(parent, dict):
+            parent[self.path[-1]] = value
+        else:
+            parent.append(value)
+            self.path[-1] += 1
+        self.state = AFTER
+
+
+def format_path(path):
+    text = ""
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+
+def stream_fields(response, schema):
+    """
+    Yield (path, value) from a streamed chat completion as each value is complete. Reading stops, and the
+    response is closed so the model stops generating, as soon as the schema allows nothing more: the root
+    object is closed, or every one of its properties is complete and additionalProperties is false.
+    """
+    parser = IncrementalJsonParser()
+    remaining = None
+    if schema.get("additionalProperties") is False and schema.get("properties"):
+        remaining = set(schema["properties"])
+    try:
+        for update in response:
+            if not update.choices:
+                continue
+            for path, value in parser.feed(update.choices[0].delta.content or ""):
+                yield path, value
+                if remaining is not None and len(path) == 1:
+                    remaining.discard(path[0])
+            if parser.done or remaining == set():
+                return
+    finally:
+        response.close()
@@ -0,0 +1,157 @@
+"""Local stub of a chat completions endpoint that generates its response a token at a time
+
+> python stream_stub.py --port 8002 --token-delay 0.02
+
+Answers like the model in final_app.py would, in the format of response_schema_openai.json. Streaming
+requests get a server-sent event per token as it is generated, others get the whole response once every
+token is generated. --trailing-tokens adds whitespace after the JSON, like a model in JSON mode that does
+not stop at the end of the document. Only the Python standard library is used.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# roughly how a tokenizer splits text: words, punctuation and runs of whitespace
+TOKEN = re.compile(r"\s+|\w+|[^\w\s]")
+
+
+class StubState:
+    def __init__(self, first_token_delay, token_delay, trailing_tokens):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.trailing_tokens = trailing_tokens
+        # tokens generated, including the ones a client stopped reading
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def generated(self):
+        with self.lock:
+            self.tokens += 1
+
+
+def make_tokens(query, trailing_tokens):
+    content = {
+        "topic": query,
+        "question": f"Which principle best explains {query}, and how would you show it with an everyday example?",
+        "answer": f"The central principle of {query}, shown by an example from daily life.",
+        "hints": [
+            f"Start from the definition of {query} you learned first.",
+            "Think about which quantity stays the same and which one changes.",
+            "Picture a simple experiment you could do at home that shows it.",
+        ],
+    }
+    return TOKEN.findall(json.dumps(content, indent=2)) + ["\n"] * trailing_tokens
+
+
+def last_user_text(messages):
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(item.get("text", "") for item in content)
+            return content or ""
+    return ""
+
+
+def make_chunk(model, delta, finish_reason=None):
+    return {
+        "id": "stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True
+    state = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "stub")
+        tokens = make_tokens(last_user_text(body.get("messages", [])), self.state.trailing_tokens)
+        time.sleep(self.state.first_token_delay)
+        if body.get("stream"):
+            self.stream(model, tokens)
+            return
+        for _ in tokens:
+            time.sleep(self.state.token_delay)
+            self.state.generated()
+        completion = {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(tokens)}}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+        data = json.dumps(completion).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream(self, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            self.send_event(make_chunk(model, {"role": "assistant", "content": ""}))
+            for token in tokens:
+                time.sleep(self.state.token_delay)
+                self.state.generated()
+                self.send_event(make_chunk(model, {"content": token}))
+            self.send_event(make_chunk(model, {}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading, so stop generating like a model provider does
+            pass
+
+    def send_event(self, value):
+        self.wfile.write(b"data: " + json.dumps(value).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, first_token_delay=0.3, token_delay=0.02, trailing_tokens=0):
+    """
+    Start the stub in a background thread. Returns the server, call shutdown() to stop it.
+    """
+    handler = type("Handler", (StubHandler,), {"state": StubState(first_token_delay, token_delay, trailing_tokens)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local streaming chat completions stub.")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds to generate each token")
+    parser.add_argument("--trailing-tokens", type=int, default=0, help="Whitespace tokens after the JSON")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.first_token_delay, args.token_delay, args.trailing_tokens)
+    print(f"Streaming chat completions stub on http://127.0.0.1:{args.port}, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Generated {server.RequestHandlerClass.state.tokens} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Bulk run the prompt against every query in a dataset from Python
+
+> pip install azure-ai-inference aiohttp
+> python batch_run.py --input data.jsonl --output output.jsonl
+
+Same as `Bulk Run` in AI Toolkit: the system prompt is prompt.aitk.txt, the user prompt is `{{query}}`
+and the response format is response_schema.json. Results are appended to the output file in the format
+of output-example.jsonl as soon as each one finishes, so running the same command again after an
+interruption only runs the queries that are not in the output file yet. With --cache-dir responses are also
+kept in a cache, see response_cache.py, and --cache-only replays a run from it without a model provider.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from azure.ai.inference.aio import ChatCompletionsClient
+from azure.ai.inference.models import JsonSchemaFormat, SystemMessage, UserMessage
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+from response_cache import CachedClient, ResponseCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Status codes worth trying again: timeout, rate limit and server errors
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def read_queries(path):
+    """
+    Yield queries one line at a time, so large datasets are never loaded at once.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)["query"]
+
+
+def read_done(path):
+    """
+    Count the queries already in the output file. Lines that are not results are skipped and left as they
+    are, only a result cut off at the end of the file by an interruption is removed.
+    """
+    done = Counter()
+    if not os.path.exists(path):
+        return done
+    skipped = 0
+    with open(path, "rb+") as file:
+        end = 0
+        line = b"\n"
+        for line in file:
+            try:
+                done[json.loads(line)["query"]] += 1
+                result = True
+            except (ValueError, KeyError, TypeError):
+                result = False
+                if line.strip():
+                    skipped += 1
+            end += len(line)
+        if not line.endswith(b"\n"):
+            if not result and line.startswith(b'{"query":'):
+                # written by batch_run.py and cut off, so the query runs again
+                file.truncate(end - len(line))
+                skipped -= 1
+            else:
+                # results go on lines of their own
+                file.seek(end)
+                file.write(b"\n")
+    if skipped:
+        print(f"Skipped {skipped} lines of {path} that are not results", file=sys.stderr)
+    return done
+
+
+def retry_delay(error, attempt, base_delay, max_delay):
+    """
+    Seconds to wait before the next attempt: what the server asks for in its retry headers if any,
+    otherwise exponential backoff with jitter so workers don't retry all at once.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1)):
+            value = response.headers.get(name)
+            if value:
+                try:
+                    return float(value) * scale
+                except ValueError:
+                    # HTTP date format, use backoff instead
+                    break
+    return min(max_delay, base_delay * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+class BatchRunner:
+    def __init__(
+        self, client, model, system_prompt, response_format, concurrency, max_retries, base_delay=1.0, max_delay=60.0
+    ):
+        self.client = client
+        self.model = model
+        self.system_prompt = system_prompt
+        self.response_format = response_format
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # a rate limit applies to every request, so all workers wait until this time
+        self.paused_until = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+
+    async def complete(self, query):
+        for attempt in range(self.max_retries + 1):
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await self.client.complete(
+                    messages=[SystemMessage(content=self.system_prompt), UserMessage(content=query)],
+                    model=self.model,
+                    response_format=self.response_format,
+                    max_tokens=4096,
+                    temperature=1,
+                    top_p=1,
+                )
+                return response.choices[0].message.content
+            except HttpResponseError as error:
+                if error.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise
+                delay = retry_delay(error, attempt, self.base_delay, self.max_delay)
+                if error.status_code == 429:
+                    self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            except (ServiceRequestError, ServiceResponseError) as error:
+                # connection failed or was closed
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_delay(error, attempt, self.base_delay, self.max_delay)
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def worker(self, queue, output):
+        while True:
+            query = await queue.get()
+            if query is None:
+                return
+            try:
+                response = await self.complete(query)
+            except Exception as e:
+                # not written, so it runs again next time
+                self.failed += 1
+                print(f"Error for query {query!r}: {e}", file=sys.stderr)
+                continue
+            output.write(
+                json.dumps({"query": query, "response": response}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            )
+            output.flush()
+            self.completed += 1
+
+    async def run(self, queries, output):
+        # bounded, so reading the dataset never gets far ahead of the requests
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self.worker(queue, output)) for _ in range(self.concurrency)]
+        for query in queries:
+            await queue.put(query)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+
+def skip_done(queries, done):
+    for query in queries:
+        if done[query] > 0:
+            done[query] -= 1
+            continue
+        yield query
+
+
+def load_response_format(path):
+    with open(path, "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    return JsonSchemaFormat(
+        name=schema["name"],
+        schema=schema["schema"],
+        description=schema.get("description"),
+        strict=schema.get("strict"),
+    )
+
+
+async def main_async(args):
+    with open(args.prompt, "r", encoding="utf-8") as file:
+        system_prompt = file.read()
+    response_format = load_response_format(args.response_schema)
+    done = read_done(args.output)
+    if done:
+        print(f"Resuming, {sum(done.values())} queries already in {args.output}")
+
+    cache = None
+    if args.cache_dir:
+        max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None
+        cache = ResponseCache(args.cache_dir, args.cache_ttl, max_bytes, args.cache_only)
+    elif args.cache_only:
+        raise SystemExit("--cache-only needs --cache-dir")
+
+    token = os.environ.get(args.token_env)
+    if not token:
+        # nothing is sent to the model in cache only mode
+        if not args.cache_only and urlparse(args.endpoint).hostname not in ("localhost", "127.0.0.1"):
+            raise SystemExit(f"Set the API key in the {args.token_env} environment variable")
+        # the local mock server does not check it
+        token = "mock"
+    # one client for the whole run, its connection pool is shared by all requests.
+    # retry_total=0 turns off the client's own retries, BatchRunner retries with the rate limit in mind
+    async with ChatCompletionsClient(
+        endpoint=args.endpoint,
+        credential=AzureKeyCredential(token),
+        api_version="2024-08-01-preview",
+        retry_total=0,
+    ) as client:
+        if cache:
+            client = CachedClient(client, cache)
+        runner = BatchRunner(client, args.model, system_prompt, response_format, args.concurrency, args.max_retries)
+        start = time.perf_counter()
+        with open(args.output, "a", encoding="utf-8") as output:
+            await runner.run(skip_done(read_queries(args.input), done), output)
+        seconds = time.perf_counter() - start
+
+    print(f"Completed {runner.completed} queries in {seconds:.1f}s, {runner.failed} failed, {runner.retries} retries")
+    if cache:
+        print(f"Cache: {client.hits} hits, {client.misses} requests sent, {client.shared} shared with one in flight")
+    return runner.failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk run the question generator prompt against a dataset.")
+    parser.add_argument("--input", default=os.path.join(HERE, "data.jsonl"), help="JSONL file with a query per line")
+    parser.add_argument("--output", default="output.jsonl", help="JSONL file to append query and response to")
+    parser.add_argument("--endpoint", default="https://models.inference.ai.azure.com")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--token-env", default="GITHUB_TOKEN", help="Environment variable with the API key")
+    parser.add_argument("--prompt", default=os.path.join(HERE, "prompt.aitk.txt"), help="System prompt file")
+    parser.add_argument("--response-schema", default=os.path.join(HERE, "response_schema.json"))
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at the same time")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--cache-dir", help="Directory to cache responses in, off if not given")
+    parser.add_argument("--cache-ttl", type=float, help="Seconds a cached response can be used for")
+    parser.add_argument("--cache-max-mb", type=float, help="Size limit of the cache, least recently used go first")
+    parser.add_argument("--cache-only", action="store_true", help="Only use cached responses, never ask the model")
+    args = parser.parse_args()
+
+    failed = asyncio.run(main_async(args))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
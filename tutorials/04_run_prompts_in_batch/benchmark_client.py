@@ -0,0 +1,115 @@
+"""Measure per call latency of a new ChatCompletionsClient per chat() against one reused client
+
+> pip install azure-ai-inference
+> python benchmark_client.py --calls 50 --latency 0.05
+
+Runs against the local mock server in mock_server.py, so no model provider or API key is needed.
+The mock server is plain HTTP, so the saving shown is TCP connection setup and client creation only;
+against an HTTPS endpoint a new client also pays a TLS handshake on every call.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from azure.ai.inference import ChatCompletionsClient
+from azure.ai.inference.models import JsonSchemaFormat, SystemMessage, UserMessage
+from azure.core.credentials import AzureKeyCredential
+
+from mock_server import serve
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_client(endpoint):
+    return ChatCompletionsClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential("mock"),
+        api_version="2024-08-01-preview",
+    )
+
+
+def make_request(system_prompt, response_format, query):
+    return {
+        "messages": [SystemMessage(content=system_prompt), UserMessage(content=query)],
+        "model": "gpt-4o",
+        "response_format": response_format,
+        "max_tokens": 4096,
+        "temperature": 1,
+        "top_p": 1,
+    }
+
+
+def measure(calls, request, endpoint, reuse):
+    """
+    Seconds of each call. Without reuse every call creates and closes its client, like chat() did.
+    """
+    seconds = []
+    client = make_client(endpoint) if reuse else None
+    for i in range(calls):
+        start = time.perf_counter()
+        if reuse:
+            client.complete(**request(i))
+        else:
+            with make_client(endpoint) as new_client:
+                new_client.complete(**request(i))
+        seconds.append(time.perf_counter() - start)
+    if client:
+        client.close()
+    return seconds
+
+
+def summarize(seconds):
+    ordered = sorted(seconds)
+    return {
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client reuse against a local mock server.")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the mock server waits per request")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--output", help="Optional path to write the JSON results")
+    args = parser.parse_args()
+
+    with open(os.path.join(HERE, "prompt.aitk.txt"), "r", encoding="utf-8") as file:
+        system_prompt = file.read()
+    with open(os.path.join(HERE, "response_schema.json"), "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    response_format = JsonSchemaFormat(name=schema["name"], schema=schema["schema"], strict=schema.get("strict"))
+
+    server = serve(args.port, args.latency)
+    state = server.RequestHandlerClass.state
+    endpoint = f"http://127.0.0.1:{args.port}"
+    results = {}
+    try:
+        # one call first, so imports and the mock server are warm for both
+        measure(1, lambda i: make_request(system_prompt, response_format, "warm up"), endpoint, True)
+        for name, reuse in (("new_client_per_call", False), ("reused_client", True)):
+            connections = state.connections
+            seconds = measure(
+                args.calls, lambda i: make_request(system_prompt, response_format, f"topic {i}"), endpoint, reuse
+            )
+            results[name] = {**summarize(seconds), "connections": state.connections - connections}
+    finally:
+        server.shutdown()
+
+    for name, result in results.items():
+        print(
+            f"{name:>20}: mean {result['mean_ms']:.1f} ms, p50 {result['p50_ms']:.1f} ms,"
+            f" p95 {result['p95_ms']:.1f} ms, {result['connections']} connections"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"calls": args.calls, "latency": args.latency, "results": results}, file, indent=4)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Local mock of a chat completions endpoint, to try batch_run.py without a model provider
+
+> python mock_server.py --port 8000 --latency 0.5 --rate-limit-every 10
+> python batch_run.py --endpoint http://localhost:8000 --output output.jsonl
+
+Every request gets a question in the format of response_schema.json about the last user message.
+Only the Python standard library is used.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockState:
+    def __init__(self, latency, rate_limit_every, fail_every):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.fail_every = fail_every
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def next_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def next_request(self):
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+
+def make_completion(model, query):
+    content = {
+        "topic": query,
+        "question": f"What is the most important idea in {query}?",
+        "answer": f"The key idea of {query}.",
+        "hints": ["Think about the basics.", "Recall what you learned in class.", "It is the first thing taught."],
+    }
+    return {
+        "id": "mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(content, indent=2)},
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def last_user_text(messages):
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(item.get("text", "") for item in content)
+            return content or ""
+    return ""
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # keep connections open, so clients that reuse them can be measured
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, without this the body waits for a delayed ack on kept open connections
+    disable_nagle_algorithm = True
+    state = None
+
+    def setup(self):
+        super().setup()
+        self.state.next_connection()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        number = self.state.next_request()
+        time.sleep(self.state.latency)
+        if self.state.rate_limit_every and number % self.state.rate_limit_every == 0:
+            self.send_json(
+                429,
+                {"error": {"code": "RateLimitReached", "message": "Rate limit reached"}},
+                {"Retry-After": "1", "retry-after-ms": "200"},
+            )
+        elif self.state.fail_every and number % self.state.fail_every == 0:
+            self.send_json(500, {"error": {"code": "InternalServerError", "message": "Mock failure"}})
+        elif not self.path.split("?")[0].endswith("/chat/completions"):
+            self.send_json(404, {"error": {"code": "NotFound", "message": self.path}})
+        else:
+            self.send_json(200, make_completion(body.get("model", "mock"), last_user_text(body.get("messages", []))))
+
+    def send_json(self, status, value, headers=None):
+        data = json.dumps(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, header in (headers or {}).items():
+            self.send_header(name, header)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, latency=0.0, rate_limit_every=0, fail_every=0):
+    """
+    Start the mock server in a background thread. Returns the server, call shutdown() to stop it.
+    """
+    handler = type("Handler", (MockHandler,), {"state": MockState(latency, rate_limit_every, fail_every)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock chat completions server.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds to wait before each response")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every n-th request with 429")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every n-th request with 500")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.rate_limit_every, args.fail_every)
+    print(f"Mock chat completions on http://127.0.0.1:{args.port}, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        state = server.RequestHandlerClass.state
+        print(f"Served {state.requests} requests on {state.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
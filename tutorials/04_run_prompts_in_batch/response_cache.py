@@ -0,0 +1,149 @@
+"""On-disk cache of chat completions for batch_run.py, so reruns don't ask the model the same thing again
+
+> python batch_run.py --cache-dir .cache --output output.jsonl
+> python batch_run.py --cache-dir .cache --cache-only --output replay.jsonl
+
+Responses are stored by the SHA-256 of the whole request: model, messages, response format and sampling
+parameters, so changing any of them asks the model again. Requests that are the same as one still in
+flight wait for its response instead of being sent twice. With a temperature above 0 the model could
+answer differently each time, so a cached response is a replay of an earlier answer, not a new sample.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from azure.ai.inference.models import ChatCompletions
+
+
+class CacheMiss(LookupError):
+    """
+    The request is not in the cache and the cache only mode does not allow asking the model.
+    """
+
+
+def to_plain(value):
+    # SDK models like UserMessage and JsonSchemaFormat serialize to what is sent to the model
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if hasattr(value, "items"):
+        return dict(value)
+    raise TypeError(f"Cannot use {type(value).__name__} in a cache key")
+
+
+def request_key(request):
+    data = json.dumps(request, default=to_plain, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Responses as JSON files named by request key. Entries older than ttl seconds are not used, and when the
+    files add up to more than max_bytes the least recently used ones are removed.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None, cache_only=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, _, size in self.entries())
+        if max_bytes is not None and self.size > max_bytes:
+            self.evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def entries(self):
+        for prefix in os.scandir(self.directory):
+            if prefix.is_dir():
+                for entry in os.scandir(prefix.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.remove(path)
+            return None
+        # the modified time orders entries for eviction, so a hit makes the entry recently used
+        os.utime(path)
+        return entry["response"]
+
+    def put(self, key, response):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"created": time.time(), "response": response}, file, ensure_ascii=False)
+        # replaced in one step, so a reader never sees half a file
+        os.replace(temp_path, path)
+        self.size += os.path.getsize(path)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.evict()
+
+    def remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.size -= size
+        except OSError:
+            pass
+
+    def evict(self):
+        # down to 90% of the limit, so the next few puts don't scan the directory again
+        target = self.max_bytes * 0.9
+        entries = sorted(self.entries(), key=lambda entry: entry[1])
+        self.size = sum(size for _, _, size in entries)
+        for path, _, _ in entries:
+            if self.size <= target:
+                break
+            self.remove(path)
+
+
+class CachedClient:
+    """
+    Wraps an azure.ai.inference.aio ChatCompletionsClient: complete() answers from the cache when it can,
+    and requests that are already in flight are sent once and shared.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    async def complete(self, **request):
+        key = request_key(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return ChatCompletions(cached)
+        task = self.in_flight.get(key)
+        if task is None:
+            if self.cache.cache_only:
+                raise CacheMiss(f"Response not in cache {self.cache.directory}")
+            self.misses += 1
+            task = asyncio.ensure_future(self.fetch(key, request))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        # shielded, so one caller giving up does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def fetch(self, key, request):
+        response = await self.client.complete(**request)
+        self.cache.put(key, response.as_dict())
+        return response
@@ -0,0 +1,294 @@
+"""Run code-based evaluators over a JSONL dataset of query and response pairs from Python
+
+> pip install orjson  (optional, parses JSON faster)
+> python evaluate.py --input ../04_run_prompts_in_batch/output-example.jsonl
+
+Evaluators are functions with the signature AI Toolkit generates, `(query, response, **kwargs)`, that return
+a dict with `score` and `reason`, and optionally the list of `failed_fields` that are counted per field. Pass
+them as `module:function` or `path/to/file.py:function`. Other columns of the dataset are passed as keyword
+arguments, and the response parsed once as `response_json` when it is valid JSON. The dataset is read in
+batches that worker processes evaluate, and scores are summed up as batches finish, so memory does not grow
+with the dataset.
+"""
+
+import argparse
+import importlib
+import importlib.util
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_EVALUATORS = ["is_valid_json_evaluator:is_valid_json"]
+
+# evaluators of this worker process, loaded once by init_worker
+_evaluators = {}
+
+
+class ScoreStats:
+    """
+    Running totals of the results of one evaluator, merged across batches.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.reasons = Counter()
+        self.failed_fields = Counter()
+        # message of the first evaluator error, the reasons only have its type
+        self.first_error = None
+
+    def add(self, result):
+        self.count += 1
+        score = result.get("score") if isinstance(result, dict) else None
+        if score is None:
+            self.errors += 1
+            if self.first_error is None and isinstance(result, dict):
+                self.first_error = result.get("error")
+        else:
+            self.total += score
+            self.min = score if self.min is None else min(self.min, score)
+            self.max = score if self.max is None else max(self.max, score)
+        if isinstance(result, dict) and result.get("reason"):
+            self.reasons[result["reason"]] += 1
+        if isinstance(result, dict) and result.get("failed_fields"):
+            self.failed_fields.update(result["failed_fields"])
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        self.reasons.update(other.reasons)
+        self.failed_fields.update(other.failed_fields)
+        if self.first_error is None:
+            self.first_error = other.first_error
+
+    def summary(self):
+        scored = self.count - self.errors
+        return {
+            "rows": self.count,
+            "mean": self.total / scored if scored else None,
+            "min": self.min,
+            "max": self.max,
+            "errors": self.errors,
+            "reasons": dict(self.reasons.most_common(10)),
+            "failed_fields": dict(self.failed_fields.most_common()),
+            "first_error": self.first_error,
+        }
+
+
+def load_evaluator(spec):
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    target, _, function_name = spec.rpartition(":")
+    if target.endswith(".py"):
+        module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(target))[0], target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, function_name)
+
+
+def init_worker(specs):
+    # keyed by the whole spec, files can have evaluators with the same function name
+    _evaluators.clear()
+    _evaluators.update((spec, load_evaluator(spec)) for spec in specs)
+
+
+def evaluate_row(row):
+    query = row.get("query")
+    response = row.get("response")
+    kwargs = {key: value for key, value in row.items() if key not in ("query", "response")}
+    try:
+        kwargs["response_json"] = loads(response)
+    except (ValueError, TypeError):
+        pass
+    results = {}
+    for name, evaluator in _evaluators.items():
+        try:
+            results[name] = evaluator(query, response, **kwargs)
+        except Exception as e:
+            results[name] = {"score": None, "reason": f"Evaluator error: {type(e).__name__}", "error": str(e)}
+    return results
+
+
+def evaluate_batch(lines, keep_rows):
+    """
+    Evaluate raw JSONL lines. Returns stats per evaluator, and the rows with their results if keep_rows.
+    """
+    stats = {name: ScoreStats() for name in _evaluators}
+    rows = [] if keep_rows else None
+    for line in lines:
+        try:
+            row = loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+        except ValueError as e:
+            # counted as an error of every evaluator, the rest of the batch still runs
+            for stat in stats.values():
+                stat.add({"score": None, "reason": "Invalid row", "error": f"Invalid row: {e}"})
+            continue
+        results = evaluate_row(row)
+        for name, result in results.items():
+            stats[name].add(result)
+        if keep_rows:
+            rows.append({**row, **results})
+    return stats, rows
+
+
+def read_batches(path, batch_size):
+    with open(path, "rb") as file:
+        while True:
+            lines = list(itertools.islice(file, batch_size))
+            if not lines:
+                return
+            yield [line for line in lines if line.strip()]
+
+
+def evaluate_file(path, specs, workers, batch_size=2000, output=None):
+    """
+    Evaluate every row of path with the evaluators in specs, in worker processes unless workers is 0.
+    Rows with their results are written to output in input order if given. Returns stats per evaluator.
+    """
+    totals = {spec: ScoreStats() for spec in specs}
+    rows_done = 0
+    start = time.perf_counter()
+
+    def merge(result):
+        nonlocal rows_done
+        stats, rows = result
+        for name, stat in stats.items():
+            totals[name].merge(stat)
+        if output and rows:
+            output.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        rows_done += next(iter(stats.values())).count if stats else 0
+        if sys.stderr.isatty():
+            print(
+                f"\r{rows_done} rows, {rows_done / (time.perf_counter() - start):.0f} rows/s", end="", file=sys.stderr
+            )
+
+    keep_rows = output is not None
+    if workers == 0:
+        init_worker(specs)
+        for lines in read_batches(path, batch_size):
+            merge(evaluate_batch(lines, keep_rows))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(specs,)) as executor:
+            # a few batches in flight per worker, so reading never gets far ahead of evaluating
+            pending = deque()
+            for lines in read_batches(path, batch_size):
+                pending.append(executor.submit(evaluate_batch, lines, keep_rows))
+                if len(pending) >= workers * 2:
+                    merge(pending.popleft().result())
+            while pending:
+                merge(pending.popleft().result())
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    return totals
+
+
+def print_summary(totals, rows, seconds):
+    print(f"Evaluated {rows} rows in {seconds:.2f}s, {rows / seconds:.0f} rows/s")
+    for name, stats in totals.items():
+        summary = stats.summary()
+        mean = "n/a" if summary["mean"] is None else f"{summary['mean']:.3f}"
+        print(f"  {name}: mean score {mean}, {summary['errors']} errors, reasons {summary['reasons']}")
+        if summary["failed_fields"]:
+            print(f"    failed fields {summary['failed_fields']}")
+        if summary["first_error"]:
+            print(f"    first error: {summary['first_error']}")
+
+
+def make_dataset(path, rows):
+    """
+    rows of the example output of tutorial 04, with every 10th response cut off so it is invalid JSON
+    """
+    example = os.path.join(HERE, "..", "04_run_prompts_in_batch", "output-example.jsonl")
+    with open(example, "r", encoding="utf-8") as file:
+        examples = [json.loads(line) for line in file if line.strip()]
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(rows):
+            row = dict(rng.choice(examples))
+            if i % 10 == 0:
+                row["response"] = row["response"][: len(row["response"]) // 2]
+            file.write(json.dumps(row) + "\n")
+
+
+def benchmark(rows, specs, workers):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "dataset.jsonl")
+        make_dataset(path, rows)
+        print(f"Parsing with {loads.__module__}")
+        for name, count in (("in this process", 0), (f"{workers} worker processes", workers)):
+            start = time.perf_counter()
+            totals = evaluate_file(path, specs, count)
+            seconds = time.perf_counter() - start
+            print(f"{name}: {seconds:.2f}s, {rows / seconds:.0f} rows/s")
+        print_summary(totals, rows, seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run evaluators over a JSONL dataset of query and response pairs.")
+    parser.add_argument("--input", help="JSONL file with query and response per line")
+    parser.add_argument("--evaluator", action="append", help="module:function or file.py:function, can be repeated")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, 0 for none")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows sent to a worker at a time")
+    parser.add_argument("--output", help="Optional JSONL file to write each row with its results to")
+    parser.add_argument("--summary-output", help="Optional JSON file to write the summary to")
+    parser.add_argument("--benchmark", type=int, default=0, help="Evaluate a generated dataset of this many rows")
+    args = parser.parse_args()
+    # the same evaluator given twice runs once
+    specs = list(dict.fromkeys(args.evaluator or DEFAULT_EVALUATORS))
+    # loaded here first, so a wrong spec is reported instead of breaking the worker processes
+    for spec in specs:
+        try:
+            load_evaluator(spec)
+        except Exception as e:
+            parser.error(f"argument --evaluator: cannot load {spec}: {type(e).__name__}: {e}")
+
+    if args.benchmark:
+        benchmark(args.benchmark, specs, args.workers)
+        return
+    if not args.input:
+        parser.error("--input is required")
+
+    start = time.perf_counter()
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        totals = evaluate_file(args.input, specs, args.workers, args.batch_size, output)
+    finally:
+        if output:
+            output.close()
+    seconds = time.perf_counter() - start
+    rows = max((stats.count for stats in totals.values()), default=0)
+    print_summary(totals, rows, seconds)
+    if args.summary_output:
+        with open(args.summary_output, "w", encoding="utf-8") as file:
+            json.dump({name: stats.summary() for name, stats in totals.items()}, file, indent=4)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,21 @@
+import json
+
 # The method signature is generated automatically, please don't change it.
 # Create a new evaluator if you'd like to change the method signature, like arguments passed to the method.
 def is_valid_json(query, response, **kwargs):
+    # evaluate.py passes the response already parsed, AI Toolkit passes only the text
+    if "response_json" in kwargs:
+        parsed = kwargs["response_json"]
+    else:
+        try:
+            parsed = json.loads(response)
+        except (ValueError, TypeError):
+            return {
+                "score": 0.0,
+                "reason": "Invalid JSON"
+            }
     required_fields = ["question", "hints", "answer"]
-    if not all(field in response for field in required_fields):
+    if not isinstance(parsed, dict) or not all(field in parsed for field in required_fields):
         return {
             "score": 0.0,
             "reason": "Missing required fields"
@@ -10,4 +23,4 @@ def is_valid_json(query, response, **kwargs):
     return {
         "score": 1.0,
         "reason": "Valid JSON structure"
-    }
\ No newline at end of file
+    }
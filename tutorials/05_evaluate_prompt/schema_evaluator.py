@@ -0,0 +1,335 @@
+"""Code-based evaluator that checks responses against the JSON schema of the response format
+
+> python evaluate.py --input output.jsonl --evaluator schema_evaluator:is_valid_schema
+> python schema_evaluator.py --benchmark 1000000
+
+The schema is response_schema.json of tutorial 04 unless the dataset has a `schema_path` column. Both the
+OpenAI response format files, with the schema under `schema`, and plain schemas like the Gemini one work.
+Each schema file is compiled once into nested Python checks and cached, instead of walking the schema again
+for every response. Failing fields are returned as `failed_fields`, which evaluate.py counts per field.
+Schemas with keywords the compiler does not know need jsonschema, pip install jsonschema, and use a
+jsonschema validator that is also created once.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from functools import lru_cache
+
+try:
+    from jsonschema.validators import validator_for
+except ImportError:
+    validator_for = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCHEMA = os.path.join(HERE, "..", "04_run_prompts_in_batch", "response_schema.json")
+
+TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: (isinstance(value, int) and not isinstance(value, bool))
+    or (isinstance(value, float) and value.is_integer()),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+# only describe the schema, nothing to check
+ANNOTATION_KEYWORDS = {"$schema", "$id", "$comment", "title", "description", "default", "examples"}
+COMPILED_KEYWORDS = {
+    "type",
+    "properties",
+    "required",
+    "additionalProperties",
+    "items",
+    "enum",
+    "const",
+    "minItems",
+    "maxItems",
+    "minLength",
+    "maxLength",
+    "minimum",
+    "maximum",
+}
+
+
+class _UnknownKeywords(Exception):
+    pass
+
+
+class UnsupportedSchemaError(ValueError):
+    """
+    The schema has keywords that only jsonschema can check, and jsonschema is not installed.
+    """
+
+
+def unknown_keywords(schema):
+    keywords = set(schema) - COMPILED_KEYWORDS - ANNOTATION_KEYWORDS
+    # forms of compiled keywords that only jsonschema checks
+    if "items" in schema and not isinstance(schema["items"], dict):
+        keywords.add("items as a list")
+    names = [schema["type"]] if isinstance(schema.get("type"), str) else schema.get("type", [])
+    keywords.update(f"type {name}" for name in names if name not in TYPE_CHECKS)
+    children = list(schema.get("properties", {}).values()) + [schema.get("items"), schema.get("additionalProperties")]
+    for child in children:
+        if isinstance(child, dict):
+            keywords |= unknown_keywords(child)
+    return keywords
+
+
+def join_path(path, name):
+    return f"{path}.{name}" if path else name
+
+
+def compile_node(schema, path):
+    """
+    A function(value, errors) that appends (field, message) for each failure of value against schema.
+    Array items are reported as `field[]`, so failures of every item count for the same field.
+    """
+    if set(schema) - COMPILED_KEYWORDS - ANNOTATION_KEYWORDS:
+        raise _UnknownKeywords()
+    if "items" in schema and not isinstance(schema["items"], dict):
+        raise _UnknownKeywords()
+    field = path or "(root)"
+    checks = []
+
+    if "type" in schema:
+        names = [schema["type"]] if isinstance(schema["type"], str) else schema["type"]
+        if any(name not in TYPE_CHECKS for name in names):
+            raise _UnknownKeywords()
+        type_checks = [TYPE_CHECKS[name] for name in names]
+        message = f"expected {' or '.join(names)}"
+
+        def check_type(value, errors):
+            if not any(type_check(value) for type_check in type_checks):
+                errors.append((field, message))
+                return False
+            return True
+
+        checks.append(check_type)
+
+    if "enum" in schema or "const" in schema:
+        allowed = schema["enum"] if "enum" in schema else [schema["const"]]
+
+        def check_enum(value, errors):
+            if value not in allowed:
+                errors.append((field, "not an allowed value"))
+            return True
+
+        checks.append(check_enum)
+
+    for keyword, kind, compare, limit_message in (
+        ("minLength", str, lambda value, limit: len(value) >= limit, "too short"),
+        ("maxLength", str, lambda value, limit: len(value) <= limit, "too long"),
+        ("minItems", list, lambda value, limit: len(value) >= limit, "too few items"),
+        ("maxItems", list, lambda value, limit: len(value) <= limit, "too many items"),
+        ("minimum", (int, float), lambda value, limit: value >= limit, "too small"),
+        ("maximum", (int, float), lambda value, limit: value <= limit, "too large"),
+    ):
+        if keyword in schema:
+
+            def check_limit(value, errors, kind=kind, compare=compare, limit=schema[keyword], message=limit_message):
+                if isinstance(value, kind) and not isinstance(value, bool) and not compare(value, limit):
+                    errors.append((field, message))
+                return True
+
+            checks.append(check_limit)
+
+    properties = {
+        name: compile_node(child, join_path(path, name)) for name, child in schema.get("properties", {}).items()
+    }
+    required = [(name, join_path(path, name)) for name in schema.get("required", [])]
+    additional = schema.get("additionalProperties", True)
+    check_additional = compile_node(additional, join_path(path, "*")) if isinstance(additional, dict) else None
+    if properties or required or additional is not True:
+
+        def check_object(value, errors):
+            if not isinstance(value, dict):
+                return True
+            for name, required_field in required:
+                if name not in value:
+                    errors.append((required_field, "missing"))
+            for name, item in value.items():
+                check_property = properties.get(name)
+                if check_property:
+                    check_property(item, errors)
+                elif additional is False:
+                    errors.append((join_path(path, name), "not allowed"))
+                elif check_additional:
+                    check_additional(item, errors)
+            return True
+
+        checks.append(check_object)
+
+    if "items" in schema:
+        check_item = compile_node(schema["items"], f"{field}[]" if path else "[]")
+
+        def check_items(value, errors):
+            if isinstance(value, list):
+                for item in value:
+                    check_item(item, errors)
+            return True
+
+        checks.append(check_items)
+
+    def check(value, errors):
+        for node_check in checks:
+            if not node_check(value, errors):
+                return
+
+    return check
+
+
+def compile_with_jsonschema(schema):
+    validator = validator_for(schema)(schema)
+
+    def check(value, errors):
+        for error in validator.iter_errors(value):
+            path = ""
+            for part in error.absolute_path:
+                path = path + "[]" if isinstance(part, int) else join_path(path, part)
+            errors.append((path or "(root)", error.message))
+
+    return check
+
+
+def compile_schema(schema):
+    """
+    A function(value) that returns the list of (field, message) failures, empty if value matches schema.
+    """
+    try:
+        check = compile_node(schema, "")
+    except _UnknownKeywords:
+        if validator_for is None:
+            keywords = ", ".join(sorted(unknown_keywords(schema)))
+            raise UnsupportedSchemaError(
+                f"Schema keywords {keywords} need jsonschema, pip install jsonschema"
+            ) from None
+        check = compile_with_jsonschema(schema)
+
+    def validate(value):
+        errors = []
+        check(value, errors)
+        return errors
+
+    return validate
+
+
+@lru_cache(maxsize=None)
+def load_schema(path):
+    """
+    The validator for the schema file at path, or the error that it can't be used. The error is cached as
+    well, so a schema that can't be used is read and checked once, not again for every response.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            schema = json.load(file)
+        # OpenAI response format files have the schema with its name
+        if "name" in schema and isinstance(schema.get("schema"), dict):
+            schema = schema["schema"]
+        return compile_schema(schema), None
+    except (OSError, ValueError) as e:
+        return None, e
+
+
+def load_validator(path):
+    validate, error = load_schema(path)
+    if error:
+        raise error
+    return validate
+
+
+# The method signature is generated automatically, please don't change it.
+# Create a new evaluator if you'd like to change the method signature, like arguments passed to the method.
+def is_valid_schema(query, response, **kwargs):
+    validate = load_validator(os.path.abspath(kwargs.get("schema_path") or DEFAULT_SCHEMA))
+    # evaluate.py passes the response already parsed
+    if "response_json" in kwargs:
+        parsed = kwargs["response_json"]
+    else:
+        try:
+            parsed = json.loads(response)
+        except (ValueError, TypeError):
+            return {"score": 0.0, "reason": "Invalid JSON", "failed_fields": ["(root)"]}
+    errors = validate(parsed)
+    if not errors:
+        return {"score": 1.0, "reason": "Matches schema"}
+    field, message = errors[0]
+    return {
+        "score": 0.0,
+        "reason": f"{field}: {message}",
+        "failed_fields": sorted({field for field, _ in errors}),
+    }
+
+
+def make_responses(count, seed=0):
+    """
+    Parsed responses like the tutorial 04 output, with a third of them broken in different fields
+    """
+    rng = random.Random(seed)
+    responses = []
+    for i in range(count):
+        response = {
+            "topic": f"Topic {i}",
+            "question": f"Question {i}?",
+            "answer": f"Answer {i}",
+            "hints": [f"Hint {n}" for n in range(3)],
+        }
+        broken = rng.randrange(9)
+        if broken == 0:
+            del response["answer"]
+        elif broken == 1:
+            response["hints"] = "not a list"
+        elif broken == 2:
+            response["hints"][1] = 2
+        responses.append(response)
+    return responses
+
+
+def benchmark(count, schema_path):
+    with open(schema_path, "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    schema = schema.get("schema", schema)
+    responses = make_responses(count)
+
+    start = time.perf_counter()
+    validate = load_validator(os.path.abspath(schema_path))
+    failed = sum(1 for response in responses if validate(response))
+    seconds = time.perf_counter() - start
+    print(f"compiled: {count / seconds:.0f} responses/s, {failed} failed")
+
+    try:
+        import jsonschema
+    except ImportError:
+        print("jsonschema is not installed, pip install jsonschema to compare with it")
+        return
+    # jsonschema.validate checks the schema and creates a validator for every response
+    sample = responses[: min(count, 20000)]
+    start = time.perf_counter()
+    for response in sample:
+        try:
+            jsonschema.validate(response, schema)
+        except jsonschema.ValidationError:
+            pass
+    seconds = time.perf_counter() - start
+    print(f"jsonschema.validate per response: {len(sample) / seconds:.0f} responses/s")
+    validator = jsonschema.validators.validator_for(schema)(schema)
+    start = time.perf_counter()
+    for response in responses:
+        validator.is_valid(response)
+    seconds = time.perf_counter() - start
+    print(f"jsonschema validator created once: {count / seconds:.0f} responses/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled schema validation evaluator.")
+    parser.add_argument("--benchmark", type=int, default=1000000, help="Number of responses to validate")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="Schema file to validate against")
+    args = parser.parse_args()
+    benchmark(args.benchmark, args.schema)
+
+
+if __name__ == "__main__":
+    main()